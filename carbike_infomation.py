@@ -2,7 +2,7 @@
 # vPIC / Wikipedia(ja/en) / Wikidata(車・バイク) を名寄せして統合JSONLを吐く。
 # - kind(car/bike)は使わず、統合のみ実施（kindは残すが未使用）
 # - メーカー→モデルの2段クラスタ
-# - RapidFuzz があれば高精度、無ければ簡易一致で代替
+# - RapidFuzz があれば使い、無ければ組み込みの同じ token_set_ratio（純 Python、やや遅い）で代替
 #
 # 使い方:
 #   pip install rapidfuzz
@@ -15,37 +15,190 @@
 #     --out ./export/unified_models.jsonl \
 #     --makers ./export/makers_map.json
 #
-import argparse, json, os, re, sys, unicodedata
-from collections import defaultdict, Counter
+import argparse, gc, gzip, hashlib, json, math, mmap, os, re, shutil, sys, tempfile, time, unicodedata
+from collections import defaultdict, deque, Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache, wraps
+
+from catalog_changefeed import load_prev_catalog, write_changefeed
+from catalog_snapshot import write_snapshot
+from catalog_spill import SPILL_PARTITIONS, SpillWriter, iter_spill, spill_partition
+from catalog_sqlite import write_sqlite
+from catalog_unionfind import DisjointSet
 
 # RapidFuzz（任意）
 try:
-    from rapidfuzz import fuzz
+    from rapidfuzz import fuzz, process
     HAVE_RF = True
 except Exception:
     HAVE_RF = False
 
+# Brotli（任意: --shards の .br 出力用）
+try:
+    import brotli
+    HAVE_BROTLI = True
+except Exception:
+    HAVE_BROTLI = False
+
+# orjson（任意: JSONL の読み書き高速化）
+try:
+    import orjson
+    HAVE_ORJSON = True
+except Exception:
+    HAVE_ORJSON = False
+
+# NumPy（任意: --engine matrix 用）
+try:
+    import numpy as np
+    HAVE_NP = True
+except Exception:
+    HAVE_NP = False
+
+# ---------- JSON コーデック ----------
+# orjson があれば使い、無ければ標準 json。どちらでも出力バイト列が同じになるよう
+# 書き出しは区切りの空白なし（orjson の形式）に揃える
+JSON_BACKENDS = ("orjson", "json") if HAVE_ORJSON else ("json",)
+
+def _std_loads(b):
+    return json.loads(b)
+
+def _std_dumps(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _orjson_loads(b):
+    try:
+        return orjson.loads(b)
+    except orjson.JSONDecodeError:
+        # 64bit を超える整数など orjson が読めない値だけ標準 json に回す
+        return json.loads(b)
+
+json_loads = _std_loads
+json_dumps = _std_dumps
+JSON_BACKEND = "json"
+
+def set_json_backend(name="auto"):
+    global json_loads, json_dumps, JSON_BACKEND
+    if name == "auto":
+        name = JSON_BACKENDS[0]
+    if name == "orjson":
+        if not HAVE_ORJSON:
+            raise ValueError("orjson is not installed")
+        json_loads, json_dumps = _orjson_loads, orjson.dumps
+    elif name == "json":
+        json_loads, json_dumps = _std_loads, _std_dumps
+    else:
+        raise ValueError(f"unknown json backend: {name}")
+    JSON_BACKEND = name
+
+set_json_backend()
+
 # ---------- ユーティリティ ----------
-def load_jsonl(path):
+# 入力は大きめのバイナリチャンクで読み、出力はこの行数ごとにまとめて書く
+READ_CHUNK = 1 << 22
+WRITE_BATCH = 4096
+
+def iter_jsonl_refs(path, stats=None, start=0, end=None):
+    # (レコード, 行の先頭バイトオフセット, 行のバイト長) を順に返す。
+    # stats(dict) を渡すと読めた行数 "rows" と壊れた行数 "malformed" を数える。
+    # start / end でバイト範囲を絞れる（行頭に揃っていること。chunk_ranges 参照）
+    if stats is None:
+        stats = {}
+    stats.setdefault("rows", 0)
+    stats.setdefault("malformed", 0)
+    if not path or not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        f.seek(start)
+        base = start
+        left = -1 if end is None else end - start
+        tail = b""
+        while left:
+            chunk = f.read(READ_CHUNK if left < 0 else min(READ_CHUNK, left))
+            if not chunk:
+                break
+            if left > 0:
+                left -= len(chunk)
+            lines = (tail + chunk).split(b"\n")
+            tail = lines.pop()
+            for ln in lines:
+                n = len(ln) + 1
+                rec = _decode_line(ln, stats)
+                if rec is not None:
+                    yield rec, base, n
+                base += n
+        if tail:
+            rec = _decode_line(tail, stats)
+            if rec is not None:
+                yield rec, base, len(tail)
+
+def _decode_line(ln, stats):
+    s = ln.strip()
+    if not s:
+        return None
+    try:
+        rec = json_loads(s)
+    except Exception:
+        stats["malformed"] += 1
+        return None
+    stats["rows"] += 1
+    return rec
+
+def load_jsonl(path, stats=None):
+    return [r for r, _, _ in iter_jsonl_refs(path, stats)]
+
+def chunk_ranges(path, size) -> list:
+    # ファイルをおよそ size バイトごとの [start, end) に分ける。境界は次の改行の直後に寄せる
     if not path or not os.path.exists(path):
         return []
+    total = os.path.getsize(path)
     out = []
-    with open(path, "r", encoding="utf-8") as f:
-        for ln in f:
-            ln = ln.strip()
-            if not ln:
-                continue
-            try:
-                out.append(json.loads(ln))
-            except Exception:
-                pass
+    with open(path, "rb") as f:
+        start = 0
+        while start < total:
+            end = start + size
+            if end >= total:
+                end = total
+            else:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            out.append((start, end))
+            start = end
     return out
 
+# raw 参照の file id → 入力ファイルの絶対パス
+SOURCE_FILES = []
+_raw_maps = {}
+
+def source_file_id(path) -> int:
+    path = os.path.abspath(path)
+    if path not in SOURCE_FILES:
+        SOURCE_FILES.append(path)
+    return SOURCE_FILES.index(path)
+
+def read_raw(ref):
+    # ingest が残した (file id, offset, length) から元の行を読み直す
+    fid, off, n = ref
+    mm = _raw_maps.get(fid)
+    if mm is None:
+        with open(SOURCE_FILES[fid], "rb") as f:
+            mm = _raw_maps[fid] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return json_loads(mm[off:off + n])
+
+def dump_jsonl_lines(rows) -> bytes:
+    return b"".join(json_dumps(r) + b"\n" for r in rows)
+
 def write_jsonl(path, rows):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        batch = []
         for r in rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+            batch.append(r)
+            if len(batch) >= WRITE_BATCH:
+                f.write(dump_jsonl_lines(batch))
+                batch = []
+        f.write(dump_jsonl_lines(batch))
 
 def ascii_fold(s: str) -> str:
     # 全角→半角 / NFKD 正規化 / アクセント除去
@@ -53,175 +206,828 @@ def ascii_fold(s: str) -> str:
     s = "".join(c for c in s if not unicodedata.combining(c))
     return s
 
+# ---------- 正規化 ----------
+# 正規表現はここで1回だけコンパイルし、正規化結果は生文字列をキーに LRU キャッシュする
+# （同じメーカー名・モデル名が vPIC / Wikipedia / Wikidata で大量に重複するため）
+NORM_CACHE_SIZE = 1 << 16
+
+_RE_SPACES = re.compile(r"\s+")
+_RE_COMPANY_PUNCT = re.compile(r"[.,'’`]")
+_RE_COMPANY_FORM = re.compile(r"\b(company|co|corp|corporation|inc|ltd|llc|gmbh|ag|sa|sarl|s\.p\.a|pte|pty|plc|bv|有限会社|株式会社)\b")
+_RE_COMPANY_MOTOR = re.compile(r"\b(motors?|motor\s+co|motor\s+company|automobile|automobiles|vehicle|vehicles)\b")
+
 def normalize_company_suffixes(s: str) -> str:
     # 会社語尾/記号を削る（Nissan Motor Co., Ltd. → nissan motor）
     s = s.lower()
     s = s.replace("&", " and ")
-    s = re.sub(r"[.,'’`]", " ", s)
-    s = re.sub(r"\b(company|co|corp|corporation|inc|ltd|llc|gmbh|ag|sa|sarl|s\.p\.a|pte|pty|plc|bv|有限会社|株式会社)\b", " ", s)
-    s = re.sub(r"\b(motors?|motor\s+co|motor\s+company|automobile|automobiles|vehicle|vehicles)\b", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
+    s = _RE_COMPANY_PUNCT.sub(" ", s)
+    s = _RE_COMPANY_FORM.sub(" ", s)
+    s = _RE_COMPANY_MOTOR.sub(" ", s)
+    s = _RE_SPACES.sub(" ", s).strip()
     return s
 
+# 例外マッピング（必要に応じて拡張）
+MAKER_REPL = {
+    "toyota motor": "toyota",
+    "nissan motor": "nissan",
+    "honda motor": "honda",
+    "mitsubishi motors": "mitsubishi",
+    "hyundai motor": "hyundai",
+    "kia motors": "kia",
+    "bmw ag": "bmw",
+    "mercedes benz": "mercedes-benz",
+    "vw": "volkswagen",
+    "v w": "volkswagen",
+    "triumph motor": "triumph",
+    "kawasaki heavy industries": "kawasaki",
+    "suzuki motor": "suzuki",
+    "yamaha motor": "yamaha",
+    "harley davidson": "harley-davidson",
+}
+
+@lru_cache(maxsize=NORM_CACHE_SIZE)
 def norm_maker_name(name: str) -> str:
     if not name:
         return ""
     s = name.strip()
     s = ascii_fold(s)
     s = normalize_company_suffixes(s)
-    # 例外マッピング（必要に応じて拡張）
-    REPL = {
-        "toyota motor": "toyota",
-        "nissan motor": "nissan",
-        "honda motor": "honda",
-        "mitsubishi motors": "mitsubishi",
-        "hyundai motor": "hyundai",
-        "kia motors": "kia",
-        "bmw ag": "bmw",
-        "mercedes benz": "mercedes-benz",
-        "vw": "volkswagen",
-        "v w": "volkswagen",
-        "triumph motor": "triumph",
-        "kawasaki heavy industries": "kawasaki",
-        "suzuki motor": "suzuki",
-        "yamaha motor": "yamaha",
-        "harley davidson": "harley-davidson",
-    }
-    if s in REPL:
-        s = REPL[s]
-    return s
+    return MAKER_REPL.get(s, s)
 
 MODEL_STOPWORDS = {"(car)", "(automobile)", "(vehicle)", "series", "class"}
+_RE_MODEL_PAREN = re.compile(r"\s*$begin:math:text$[^)]*$end:math:text$$")
+_RE_MODEL_DOTS = re.compile(r"[·•･・]")
+# 末尾ストップワードは1本の選択パターンにまとめる
+_RE_MODEL_STOP = re.compile(
+    r"\b(?:" + "|".join(re.escape(w) for w in sorted(MODEL_STOPWORDS)) + r")\b$", re.I)
+
+@lru_cache(maxsize=NORM_CACHE_SIZE)
 def norm_model_name(name: str) -> str:
     if not name:
         return ""
     s = name.strip()
     s = ascii_fold(s)
     # 括弧内注記削除（末尾）
-    s = re.sub(r"\s*$begin:math:text$[^)]*$end:math:text$$", "", s)
+    s = _RE_MODEL_PAREN.sub("", s)
     # 記号統一
     s = s.replace("–", "-").replace("—", "-").replace("‐", "-")
-    s = re.sub(r"[·•･・]", " ", s)
+    s = _RE_MODEL_DOTS.sub(" ", s)
     # 連続空白
-    s = re.sub(r"\s+", " ", s)
+    s = _RE_SPACES.sub(" ", s)
     # 末尾の series/class 等を除去
-    for w in MODEL_STOPWORDS:
-        s = re.sub(rf"\b{re.escape(w)}\b$", "", s, flags=re.I).strip()
+    s = _RE_MODEL_STOP.sub("", s.strip()).strip()
     return s
 
+def norm_cache_stats() -> dict:
+    # 正規化キャッシュのヒット/ミス数
+    out = {}
+    for key, fn in (("maker", norm_maker_name), ("model", norm_model_name)):
+        # --profile で計測版に差し替えられていても元の lru_cache を見る
+        while not hasattr(fn, "cache_info"):
+            fn = fn.__wrapped__
+        info = fn.cache_info()
+        out[key] = {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+    return out
+
+# ---------- 組み込み token_set_ratio（RapidFuzz が無いとき） ----------
+# RapidFuzz の fuzz.token_set_ratio と同じ値を返す実装（processor なし・score_cutoff 付き）。
+# 名前ごとのトークン分解（整数 id・連結文字列・文字位置のビット表）は1回だけ作ってキャッシュし、
+# 連結文字列どうしの LCS はビット並列（Hyyrö）で、多倍長整数の加減算とビット演算だけで求める。
+# 長さの差から出る上限が閾値に届かないペアは LCS を計算しない
+_TOKEN_IDS = {}
+
+def _char_masks(s: str) -> dict:
+    # 文字 → s 中の出現位置のビット列
+    masks = {}
+    bit = 1
+    for c in s:
+        masks[c] = masks.get(c, 0) | bit
+        bit <<= 1
+    return masks
+
+@lru_cache(maxsize=NORM_CACHE_SIZE)
+def token_profile(s: str) -> tuple:
+    # (トークン（文字列順・重複なし）, 各トークンの id, id の集合, 連結文字列, そのビット表)
+    toks = tuple(sorted(set(s.split())))
+    tids = tuple(_TOKEN_IDS.setdefault(t, len(_TOKEN_IDS)) for t in toks)
+    joined = " ".join(toks)
+    return toks, tids, frozenset(tids), joined, _char_masks(joined)
+
+def _lcs_len(masks, m, b) -> int:
+    # masks（長さ m の文字列のビット表）と b の最長共通部分列の長さ
+    full = (1 << m) - 1
+    v = full
+    for c in b:
+        u = v & masks.get(c, 0)
+        v = ((v + u) | (v - u)) & full
+    return m - bin(v).count("1")
+
+def _norm_score(dist, lensum) -> float:
+    return (100 - 100 * dist / lensum) if lensum else 100
+
+def _token_set(pa, pb, cutoff=0):
+    ta, ia, sa, ja, ma = pa
+    tb, ib, sb, jb, mb = pb
+    if not ta or not tb:
+        return 0
+    if sa.isdisjoint(sb):
+        # 共通トークンなし: 連結文字列どうしの比較だけ（大半のペアはここ）
+        ab, ba = len(ja), len(jb)
+        lensum = ab + ba
+        # LCS は短い方の長さ以下なので、長さの差だけで閾値に届かなければ打ち切る
+        if 100 - 100 * abs(ab - ba) / lensum < cutoff:
+            return 0
+        # 長い方のビット表で短い方をなめる（ループ回数が短い方の長さになる）
+        lcs = _lcs_len(ma, ab, jb) if ab >= ba else _lcs_len(mb, ba, ja)
+        r = 100 - 100 * (lensum - 2 * lcs) / lensum
+        return r if r >= cutoff else 0
+    common = sa & sb
+    # 片方のトークンがもう片方に全部含まれる
+    if len(common) == len(sa) or len(common) == len(sb):
+        return 100
+    dab = " ".join([t for t, i in zip(ta, ia) if i not in common])
+    dba = " ".join([t for t, i in zip(tb, ib) if i not in common])
+    sect = sum(len(t) for t, i in zip(ta, ia) if i in common) + len(common) - 1
+    ab, ba = len(dab), len(dba)
+    sab = sect + 1 + ab
+    sba = sect + 1 + ba
+    best = max(_norm_score(1 + ab, sect + sab), _norm_score(1 + ba, sect + sba))
+    # 差分どうしの比較。上限で best・閾値に届かなければ省く
+    ub = _norm_score(abs(ab - ba), sab + sba)
+    if ub > best and ub >= cutoff:
+        if ab < ba:
+            dab, dba, ab, ba = dba, dab, ba, ab
+        r = _norm_score(ab + ba - 2 * _lcs_len(_char_masks(dab), ab, dba), sab + sba)
+        if r > best:
+            best = r
+    return best if best >= cutoff else 0
+
+def token_set_ratio(a: str, b: str, cutoff=0) -> float:
+    return _token_set(token_profile(a), token_profile(b), cutoff)
+
+def token_set_scores(a: str, bs, cutoff=0) -> list:
+    # a と bs の各要素のスコア。a の分解は1回だけ
+    pa = token_profile(a)
+    prof = token_profile
+    return [_token_set(pa, prof(b), cutoff) for b in bs]
+
 def rf_ratio(a: str, b: str) -> int:
     if not HAVE_RF:
-        # 簡易（完全一致=100 / 前方一致95 / トークン一致90 / else 0）
-        if a == b:
-            return 100
-        if a.startswith(b) or b.startswith(a):
-            return 95
-        at = set(a.split()); bt = set(b.split())
-        if at and bt and (at == bt or at.issubset(bt) or bt.issubset(at)):
-            return 90
-        return 0
+        return token_set_ratio(a, b)
     return fuzz.token_set_ratio(a, b)
 
-def year_overlap(y1, y2) -> bool:
-    # y: dict like {"start": 1999, "end": 2005}  Noneを無限扱い
-    if not y1 or not y2:
-        return True
-    s1 = y1.get("start"); e1 = y1.get("end")
-    s2 = y2.get("start"); e2 = y2.get("end")
-    if s1 is None and e1 is None:
-        return True
-    if s2 is None and e2 is None:
-        return True
-    # None は広い区間扱い
-    s1 = -10**9 if s1 is None else s1
-    e1 =  10**9 if e1 is None else e1
-    s2 = -10**9 if s2 is None else s2
-    e2 =  10**9 if e2 is None else e2
-    return not (e1 < s2 or e2 < s1)
+def rf_scores(a: str, bs, cutoff=0) -> list:
+    # a と候補 bs をまとめて採点する。cutoff 未満のスコアは 0 になることがある
+    # （RapidFuzz の score_cutoff と同じ。cutoff 以上の値は rf_ratio と一致する）
+    if not HAVE_RF:
+        return token_set_scores(a, bs, cutoff)
+    ratio = fuzz.token_set_ratio
+    return [ratio(a, b, score_cutoff=cutoff) for b in bs]
+
+def year_span(start, end) -> tuple:
+    # 年の区間 (lo, hi)。欠損（None / NO_YEAR）は無限に広い端、逆転していれば入れ替える
+    lo = -10**9 if start is None or start == NO_YEAR else start
+    hi =  10**9 if end is None or end == NO_YEAR else end
+    return (hi, lo) if lo > hi else (lo, hi)
+
+def split_generations(records) -> list:
+    # 同名クラスタを年の区間（year_span）が重なってつながる世代に分ける。
+    # 開始年でソートして終了年の最大値を伸ばしながら掃くだけなので O(n log n)。
+    # 年が無い行はどの世代とも重なる扱いだが、それで全世代をつなげてしまわないよう
+    # いちばん行数（集約前の件数）の多い世代（同数なら古い方）に入れる。世代は古い順
+    known, los, his, unknown = [], [], [], []
+    for r in records:
+        if r.y_start == NO_YEAR and r.y_end == NO_YEAR:
+            unknown.append(r)
+        else:
+            lo, hi = year_span(r.y_start, r.y_end)
+            known.append(r); los.append(lo); his.append(hi)
+    if not known:
+        return [list(records)]
+    # 開始年の順（同じ開始年は入力順のまま）
+    gens = []
+    cur_hi = None
+    for i in sorted(range(len(known)), key=los.__getitem__):
+        if cur_hi is None or los[i] > cur_hi:
+            gens.append([known[i]])
+            cur_hi = his[i]
+        else:
+            if his[i] > cur_hi:
+                cur_hi = his[i]
+            gens[-1].append(known[i])
+    if unknown:
+        max(gens, key=lambda g: sum(r.count for r in g)).extend(unknown)
+    return gens
+
+# ---------- 取り込みレコード ----------
+# 年の欠損（0年の車種は存在しないので 0 を番兵にする）
+NO_YEAR = 0
+
+def to_year(v) -> int:
+    if isinstance(v, bool):
+        return NO_YEAR
+    if isinstance(v, int):
+        return v
+    if isinstance(v, str) and v.strip().lstrip("-").isdigit():
+        return int(v)
+    return NO_YEAR
+
+def intern_str(v):
+    # 同じ文字列（maker_norm / lang / source など）を1オブジェクトに寄せる
+    if isinstance(v, str):
+        return sys.intern(v)
+    if isinstance(v, list):
+        return tuple(sys.intern(x) if isinstance(x, str) else x for x in v)
+    return v
+
+class Row:
+    # ingest → cluster_* → merge_cluster を流れる1行分（dict より小さく属性参照も速い）
+    __slots__ = ("maker_raw", "maker_norm", "model_raw", "model_norm",
+                 "y_start", "y_end", "kind", "lang", "source", "ref",
+                 "pageid", "title", "ids", "count", "maker_rep")
+
+    def __init__(self, maker_raw, maker_norm, model_raw, model_norm,
+                 y_start=NO_YEAR, y_end=NO_YEAR, kind=None, lang=None, source=(),
+                 ref=None, pageid=None, title=None, ids=(), count=1):
+        self.maker_raw = intern_str(maker_raw)
+        self.maker_norm = intern_str(maker_norm)
+        self.model_raw = intern_str(model_raw)
+        self.model_norm = intern_str(model_norm)
+        self.y_start = y_start
+        self.y_end = y_end
+        self.kind = intern_str(kind)
+        self.lang = intern_str(lang)
+        self.source = intern_str(source)
+        self.ref = ref
+        self.pageid = pageid
+        self.title = title
+        self.ids = ids                # 完全一致キー（row_ids）
+        self.count = count            # 同じ内容の入力行の数（collapse_duplicates）
+        self.maker_rep = self.maker_norm
 
 # ---------- 読み込み＆整形 ----------
-def ingest(paths, lang=None, source_tag=None):
-    items = []
-    for p in paths or []:
-        for r in load_jsonl(p):
-            maker_raw = (r.get("maker") or {}).get("name") or r.get("maker_name") or ""
-            model_raw = r.get("model") or r.get("model_name") or r.get("itemLabel") or ""
-            maker_n = norm_maker_name(maker_raw)
-            model_n = norm_model_name(model_raw)
-            if not maker_n or not model_n:
-                continue
-            years = r.get("years") or {}
-            item = {
-                "maker_raw": maker_raw,
-                "maker_norm": maker_n,
-                "model_raw": model_raw,
-                "model_norm": model_n,
-                "years": {
-                    "start": years.get("start"),
-                    "end": years.get("end"),
-                },
-                "kind": r.get("kind"),
-                "lang": lang,
-                "source": source_tag or r.get("source") or [],
-                "raw": r,
-            }
+def row_fields(r, lang=None, source_tag=None):
+    # 1レコード → Row の材料（ref 以外）。メーカー名・モデル名が正規化で空になれば None
+    maker_raw = (r.get("maker") or {}).get("name") or r.get("maker_name") or ""
+    model_raw = r.get("model") or r.get("model_name") or r.get("itemLabel") or ""
+    maker_n = norm_maker_name(maker_raw)
+    model_n = norm_model_name(model_raw)
+    if not maker_n or not model_n:
+        return None
+    years = r.get("years") or {}
+    return (maker_raw, maker_n, model_raw, model_n,
+            to_year(years.get("start")), to_year(years.get("end")),
+            r.get("kind"), lang, source_tag or r.get("source") or (),
             # 参考: wikipedia pageid/title
-            if "pageid" in r:
-                item["pageid"] = r["pageid"]
-            if "fulltitle" in r:
-                item["title"] = r["fulltitle"]
-            items.append(item)
-    return items
+            r.get("pageid"), r.get("fulltitle"), row_ids(r, lang))
 
-# ---------- メーカークラスタ ----------
-def cluster_makers(items, th=92):
-    # maker_norm 単位→類似名をまとめて1クラスタに
-    names = sorted({x["maker_norm"] for x in items if x["maker_norm"]})
+def make_row(f, ref) -> Row:
+    # 元レコードは保持せず参照だけ（必要なら read_raw で読み直す）
+    return Row(*f[:9], ref=ref, pageid=f[9], title=f[10], ids=f[11])
+
+def iter_ingest(paths, lang=None, source_tag=None, stats=None):
+    # (Row の材料, ref) を1行ずつ返す。stats(dict) を渡すとファイルごとの読込行数・壊れた行数を入れる
+    for p in paths or []:
+        fid = source_file_id(p)
+        st = {}
+        if stats is not None:
+            stats[p] = st
+        for r, off, n in iter_jsonl_refs(p, st):
+            f = row_fields(r, lang, source_tag)
+            if f is not None:
+                yield f, (fid, off, n)
+
+def ingest(paths, lang=None, source_tag=None, stats=None):
+    return [make_row(f, ref) for f, ref in iter_ingest(paths, lang, source_tag, stats)]
+
+# ---------- 重複行の集約 ----------
+# vPIC の年式ごとの行や Wikipedia の車・バイク一覧の重なりで、正規化後に全フィールドが
+# 同じ行が大量に出る。クラスタの前に1行へまとめて count に件数を持たせる。
+# クラスタは名前の集合、マージは集合と件数付きの Counter しか見ないので結果は変わらない
+def dedup_key(r) -> tuple:
+    # マージ・結合・世代分けが読むフィールド全部（ref だけは行ごとに違うので除く）
+    return (r.maker_raw, r.maker_norm, r.model_raw, r.model_norm, r.y_start, r.y_end,
+            r.kind, r.lang, r.source, r.pageid, r.title, r.ids)
+
+def collapse_duplicates(rows) -> list:
+    # 最初に出た行を残して後続の同じ行の件数を足す（順序は初出順のまま）
+    first = {}
+    out = []
+    for r in rows:
+        key = dedup_key(r)
+        d = first.get(key)
+        if d is None:
+            first[key] = r
+            out.append(r)
+        else:
+            d.count += r.count
+    return out
+
+# ---------- 並列読み込み ----------
+# 入力ファイルを行頭に揃えたバイト範囲に切り、解析と正規化をプロセスプールで行う。
+# ワーカーは Row の材料のタプルとオフセットだけを返し、Row はこちらで作る
+# （文字列の intern を1プロセスに揃えるため）。結果は投入順に並べるので直列と同じ順になる
+INGEST_CHUNK = 8 << 20
+# 並列時に先に投入しておくチャンク数（ワーカー数あたり）。結果を溜め込みすぎないための上限
+INGEST_AHEAD = 2
+
+@contextmanager
+def gc_paused():
+    # 読み込み中は長生きするオブジェクト（Row・文字列・dict）を大量に作るだけで循環参照は
+    # 生まれないので、世代別 GC が何度も全体を走査するのは無駄。終わったら元に戻す
+    was = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was:
+            gc.enable()
+
+def _ingest_chunk(path, start, end, lang, source_tag):
+    st = {}
+    out = []
+    with gc_paused():
+        for r, off, n in iter_jsonl_refs(path, st, start, end):
+            f = row_fields(r, lang, source_tag)
+            if f is not None:
+                out.append((f, off, n))
+    return out, st
+
+def iter_ingest_many(specs, jobs=1, stats=None, chunk_size=INGEST_CHUNK):
+    # specs: [(paths, lang, source_tag), ...]。ingest を順に呼んだのと同じ行を同じ順で
+    # (Row の材料, ref) として返す。並列時も投入は INGEST_AHEAD × jobs チャンク先までにとどめる
+    tasks = []
+    if jobs > 1:
+        for paths, lang, source_tag in specs:
+            for p in paths or []:
+                fid = source_file_id(p)
+                for a, b in chunk_ranges(p, chunk_size):
+                    tasks.append((p, fid, a, b, lang, source_tag))
+    if len(tasks) <= 1:
+        for paths, lang, source_tag in specs:
+            yield from iter_ingest(paths, lang, source_tag, stats)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as ex:
+        todo = iter(tasks)
+        pending = deque()
+
+        def submit():
+            t = next(todo, None)
+            if t is not None:
+                p, _, a, b, lang, source_tag = t
+                pending.append((t, ex.submit(_ingest_chunk, p, a, b, lang, source_tag)))
+
+        for _ in range(jobs * INGEST_AHEAD):
+            submit()
+        while pending:
+            (p, fid, *_), fut = pending.popleft()
+            submit()
+            out, st = fut.result()
+            if stats is not None:
+                stats.setdefault(p, {"rows": 0, "malformed": 0})
+                stats[p]["rows"] += st["rows"]
+                stats[p]["malformed"] += st["malformed"]
+            for f, off, n in out:
+                yield f, (fid, off, n)
+
+def ingest_many(specs, jobs=1, stats=None, chunk_size=INGEST_CHUNK):
+    with gc_paused():
+        return [make_row(f, ref) for f, ref in iter_ingest_many(specs, jobs, stats, chunk_size)]
+
+# ---------- 候補ブロッキング ----------
+# 全ペア比較(O(n^2))を避けるため、トークン単位の文字3-gramで転置インデックスを作り、
+# 一定数以上の gram を共有する名前だけを rf_ratio の比較対象にする。
+# 共有数の下限 need は token_set_ratio >= th から導いた証明つきの値（block_need）なので、
+# 閾値以上のペアは必ず候補に入り、クラスタは全ペア比較（--no-block）と一致する。
+# gram の少ない側の gram のうち (n - need + 1) 個に必ず共有 gram が含まれるので、各名前の
+# 希少 gram だけを prefix 索引に載せ、よく出る gram（" co" 等）の長い posting を舐めずに済ませる。
+# need < 1 の名前（短い名前・低い閾値）は gram を共有しなくても閾値を超えうるので全件と比べる
+def block_keys(name: str) -> set:
+    keys = set()
+    for t in name.split():
+        p = f" {t} "
+        for i in range(len(p) - 2):
+            keys.add(p[i:i+3])
+    return keys
+
+def token_len(name: str) -> int:
+    # token_set_ratio が比べる文字列（重複を除いたトークンを空白1つでつないだもの）の長さ
+    toks = set(name.split())
+    return sum(map(len, toks)) + len(toks) - 1 if toks else 0
+
+def block_need(n: int, length: int, th) -> int:
+    # gram 数 n・token_len が length の名前が、gram 数 n 以上の相手と token_set_ratio >= th に
+    # なるときに共有する gram 数の下限。indel 距離 d は d <= 2(100-th)/th × length に収まり、
+    # 1回の挿入・削除で壊れる gram は高々3個なので、共有数 >= n - 3d
+    # （共通トークン側との比較で決まる場合は n - d 以上なのでこれも満たす）
+    if th <= 0:
+        return 0
+    return n - 3 * math.floor(2 * (100 - th) * length / th + 1e-9)
+
+# これより少ない名前数なら全ペア比較の方が速い
+BLOCK_MIN_NAMES = 64
+
+class BlockIndex:
+    def __init__(self, names=(), th=92, df=None):
+        self.th = th
+        self.names = []
+        self.keys = []
+        self.needs = []
+        self.prefixes = []
+        self.postings = defaultdict(set)  # gram → 名前index（全 gram）
+        self.rare = defaultdict(set)      # gram → 名前index（希少 gram のみ）
+        self.live = set()                 # 登録済みで discard されていない名前index
+        self.wild = set()                 # need < 1 の名前index（gram によらず候補）
+        names = list(names)
+        # 一括構築時は全体の出現頻度で希少 gram を選ぶ（df を渡せばそれを使う）。
+        # df は prefix の選び方＝速さにだけ効き、候補集合は変わらない
+        self.df = df if df is not None else Counter(k for n in names for k in block_keys(n))
+        for n in names:
+            self.add(n)
+
+    def prefix(self, ks, need) -> list:
+        df = self.df
+        ordered = sorted(ks, key=lambda k: (df.get(k, 0), k))
+        return ordered[:len(ordered) - need + 1]
+
+    def add(self, name: str) -> int:
+        i = len(self.names)
+        ks = block_keys(name)
+        need = block_need(len(ks), token_len(name), self.th)
+        pre = self.prefix(ks, need) if need >= 1 else []
+        self.names.append(name)
+        self.keys.append(ks)
+        self.needs.append(need)
+        self.prefixes.append(pre)
+        for k in ks:
+            self.postings[k].add(i)
+        for k in pre:
+            self.rare[k].add(i)
+        self.live.add(i)
+        if need < 1:
+            self.wild.add(i)
+        return i
+
+    def discard(self, i: int):
+        # 以降の候補から外す（貪欲法で割り当て済みになった名前など）
+        for k in self.keys[i]:
+            self.postings[k].discard(i)
+        for k in self.prefixes[i]:
+            self.rare[k].discard(i)
+        self.live.discard(i)
+        self.wild.discard(i)
+
+    def candidates(self, name: str, ks=None) -> list:
+        # name と比較すべき登録済み index（昇順）
+        if ks is None:
+            ks = block_keys(name)
+        n = len(ks)
+        need = block_need(n, token_len(name), self.th)
+        if need < 1:
+            return sorted(self.live)
+        postings = self.postings; rare = self.rare
+        # 自分の希少 gram × 相手の全 gram / 自分の全 gram × 相手の希少 gram / need < 1 の相手
+        out = set().union(*[postings[k] for k in self.prefix(ks, need) if k in postings],
+                          *[rare[k] for k in ks if k in rare])
+        keys, needs = self.keys, self.needs
+        # 下限は gram の少ない側の need（同数ならどちらの need も成り立つので大きい方）
+        out = {j for j in out
+               if len(ks & keys[j]) >= (need if len(keys[j]) > n else
+                                        needs[j] if len(keys[j]) < n else max(need, needs[j]))}
+        out |= self.wild
+        return sorted(out)
+
+def greedy_groups(names, matches) -> list:
+    # 先頭から、未割り当ての名前 i ごとに matches(i, done) が返す後続の名前（閾値以上）のうち
+    # 未割り当てのものをまとめる。greedy_clusters とスイープ（ScoreGraph）で共用
+    done = [False] * len(names)
     clusters = []
-    used = set()
     for i, n in enumerate(names):
-        if n in used:
+        if done[i]:
             continue
-        group = [n]
-        used.add(n)
-        for m in names[i+1:]:
-            if m in used:
-                continue
-            if rf_ratio(n, m) >= th:
-                group.append(m)
-                used.add(m)
+        group = [n]; done[i] = True
+        for j in matches(i, done):
+            if not done[j]:
+                group.append(names[j]); done[j] = True
         clusters.append(group)
+    return clusters
+
+def greedy_clusters(names, th=92, block=True):
+    # names（ソート済み）を先頭から貪欲にまとめる。
+    # ブロッキング時は未割り当ての名前だけが索引に残るので、候補は常に後続の未使用名になる
+    if not block or len(names) < BLOCK_MIN_NAMES:
+        def matches(i, done):
+            rest = [j for j in range(i + 1, len(names)) if not done[j]]
+            return [j for j, sc in zip(rest, rf_scores(names[i], [names[j] for j in rest], th))
+                    if sc >= th]
+        return greedy_groups(names, matches)
+
+    index = BlockIndex(names, th)
+
+    def matches(i, done):
+        index.discard(i)
+        cands = index.candidates(names[i], index.keys[i])
+        for j, sc in zip(cands, rf_scores(names[i], [names[j] for j in cands], th)):
+            if sc >= th:
+                index.discard(j)
+                yield j
+    return greedy_groups(names, matches)
+
+# ---------- 類似度行列エンジン（RapidFuzz cdist） ----------
+# 1回の cdist で計算するセル数の上限（float32 で 64MB 程度）
+MATRIX_CELLS = 1 << 24
+
+def similarity_matrix(queries, choices, th=92):
+    # queries × choices の token_set_ratio 行列（閾値未満は0、全コアで計算）
+    return process.cdist(queries, choices, scorer=fuzz.token_set_ratio,
+                         score_cutoff=th, dtype=np.float32, workers=-1)
+
+def matrix_edges(names, th=92) -> list:
+    # 閾値以上のペア (i, j, スコア)（i < j）。行列は上三角だけを行ブロックごとに作る
+    n = len(names)
+    edges = []
+    rows = max(1, MATRIX_CELLS // max(n, 1))
+    for start in range(0, n, rows):
+        stop = min(n, start + rows)
+        m = similarity_matrix(names[start:stop], names[start:], th)
+        ii, jj = np.nonzero(m >= th)
+        upper = ii < jj
+        ii, jj = ii[upper], jj[upper]
+        ss = m[ii, jj].tolist()
+        if SCORE_HIST is not None:
+            # --profile: 上三角のセル数を比較回数として数える（閾値未満はスコア不明なので0扱い）
+            cells = sum(m.shape[1] - r - 1 for r in range(m.shape[0]))
+            count_scores(ss, cells)
+        edges.extend(zip((ii + start).tolist(), (jj + start).tolist(), ss))
+    return edges
+
+def edge_components(names, edges) -> list:
+    # 辺 (i, j) でつながる names の連結成分（先頭の名前の順）。matrix / uf とスイープ（ScoreGraph）で共用
+    sets = DisjointSet()
+    for i, j in edges:
+        sets.union(i, j)
+    return [[names[i] for i in g] for g in sets.groups(range(len(names)))]
+
+def matrix_clusters(names, th=92, block=True):
+    # 閾値以上のペアを辺とみなし、連結成分をクラスタにする（block 引数は貪欲法用で未使用）
+    return edge_components(names, ((i, j) for i, j, _ in matrix_edges(names, th)))
+
+# ---------- union-find エンジン（逐次挿入） ----------
+# 名前を1つずつ索引に入れ、登録済みの候補と rf_ratio >= th なら union する。
+# 結果は「閾値以上」を辺とするグラフの連結成分で（索引は閾値以上のペアを必ず候補に含む）、
+# スコアは対称なので入力順に依存せず、matrix と同じになる。
+# 既存のクラスタに後から名前を足すときも、その名前の候補分の比較だけで済む
+class StreamingClusters:
+    def __init__(self, th=92, block=True, df=None):
+        self.th = th
+        self.index = BlockIndex(th=th, df=df) if block else None
+        self.names = []
+        self.ids = {}
+        self.sets = DisjointSet()
+
+    def link(self, name: str) -> list:
+        # name を登録し、登録済みの名前との閾値以上の辺 (i, j) を返す（登録済みの名前なら空）
+        if name in self.ids:
+            return []
+        if self.index is not None:
+            cands = self.index.candidates(name)
+            self.index.add(name)
+        else:
+            cands = range(len(self.names))
+        i = len(self.names)
+        self.names.append(name)
+        self.ids[name] = i
+        return [(i, j) for j, sc in zip(cands, rf_scores(name, [self.names[j] for j in cands], self.th))
+                if sc >= self.th]
+
+    def add(self, name: str) -> int:
+        for i, j in self.link(name):
+            self.sets.union(i, j)
+        return self.ids[name]
+
+    def update(self, names):
+        for n in names:
+            self.add(n)
+
+    def clusters(self) -> list:
+        groups = self.sets.groups(range(len(self.names)))
+        # 挿入順によらず同じ並びで返す
+        return sorted(sorted(self.names[i] for i in g) for g in groups)
+
+def uf_components(names, edges) -> list:
+    # uf エンジンの並び（挿入順によらず、成分の中も成分どうしも名前順）
+    return sorted(sorted(g) for g in edge_components(names, edges))
+
+def uf_clusters(names, th=92, block=True):
+    # 一括時も逐次挿入と同じ手順（全体の gram 頻度は prefix の選択＝速さにだけ使う）
+    df = Counter(k for n in names for k in block_keys(n)) if block else None
+    sc = StreamingClusters(th, block, df)
+    return uf_components(sc.names, (e for n in names for e in sc.link(n)))
+
+CLUSTER_ENGINES = {
+    "greedy": greedy_clusters,
+    "matrix": matrix_clusters,
+    "uf": uf_clusters,
+}
+
+# ---------- 完全一致キーによる結合 ----------
+# Wikidata の QID、Wikipedia の (言語, pageid)・(言語, タイトル)、sitelinks / langlinks の
+# 言語間リンクを行のキーにし、キーを共有する行は同じ対象とみなして類似度計算の前に
+# まとめる（辞書引きだけなので O(n)）。名前が似ていない ja/en の組もここでつながる。
+# キーは "Q123" / "ja#456"（pageid）/ "ja:タイトル" の文字列
+# sitelinks のうち Wikipedia 以外のサイト
+NON_WIKIPEDIA_SITES = {"commonswiki", "metawiki", "specieswiki", "wikidatawiki", "mediawikiwiki"}
+
+def wiki_title_key(lang, title):
+    # MediaWiki のタイトル表記ゆれ（_ と空白、先頭の大文字小文字）を吸収
+    if not lang or not isinstance(title, str):
+        return None
+    t = title.replace("_", " ").strip()
+    if not t:
+        return None
+    return f"{lang}:{t[:1].upper()}{t[1:]}"
+
+def _link_pairs(r):
+    # sitelinks（{"enwiki": "T"} / {"enwiki": {"title": "T"}}）と
+    # langlinks（{"en": "T"} / [{"lang": "en", "title"|"*": "T"}]）を (言語, タイトル) に
+    sl = r.get("sitelinks")
+    if isinstance(sl, dict):
+        for site, v in sl.items():
+            if site.endswith("wiki") and site not in NON_WIKIPEDIA_SITES:
+                yield site[:-4].replace("_", "-"), v.get("title") if isinstance(v, dict) else v
+    ll = r.get("langlinks")
+    if isinstance(ll, dict):
+        yield from ll.items()
+    elif isinstance(ll, list):
+        for d in ll:
+            if isinstance(d, dict):
+                yield d.get("lang"), d.get("title") or d.get("*")
+
+def qid_of(v):
+    # "Q123" / "http://www.wikidata.org/entity/Q123" → "Q123"
+    if not isinstance(v, str):
+        return None
+    q = v[v.rfind("/") + 1:]
+    return q if q[:1] == "Q" and q[1:].isdigit() else None
+
+def row_ids(r, lang=None) -> tuple:
+    # 全行で呼ばれるので、無いキーは get 1回で済ませる
+    keys = []
+    for f in ("qid", "item", "wikibase_item"):
+        q = qid_of(r.get(f))
+        if q:
+            keys.append(q)
+    pp = r.get("pageprops")
+    if pp and isinstance(pp, dict):
+        q = qid_of(pp.get("wikibase_item"))
+        if q:
+            keys.append(q)
+    # pageid / タイトルは Wikipedia の行（言語が分かるもの）だけ
+    if lang:
+        if r.get("pageid") is not None:
+            keys.append(f"{lang}#{r['pageid']}")
+        t = wiki_title_key(lang, r.get("fulltitle") or r.get("title"))
+        if t:
+            keys.append(t)
+    if "sitelinks" in r or "langlinks" in r:
+        for ln, title in _link_pairs(r):
+            t = wiki_title_key(ln, title)
+            if t:
+                keys.append(t)
+    if not keys:
+        return ()
+    return tuple(dict.fromkeys(keys)) if len(keys) > 1 else (keys[0],)
+
+# 完全一致キーでまとめる名前の数の上限。これを超えるのはモデル名だけのタイトルなどの「ハブ」キー
+LINK_MAX_NAMES = 4
+
+def link_groups(items) -> list:
+    # キーを共有する行（推移的に）を union-find でまとめ、2行以上の組だけ返す
+    sets = DisjointSet()
+    owner = {}
+    for i, r in enumerate(items):
+        for k in r.ids:
+            j = owner.setdefault(k, i)
+            if j != i:
+                sets.union(i, j)
+    return [[items[i] for i in g] for g in sets.groups()]
+
+def linked_names(items, attr) -> list:
+    # 結合した行の組ごとの名前集合（2種類以上あるものだけ。LINK_MAX_NAMES を超える組はハブキーで
+    # つながったものとして捨てる）
+    out = []
+    for g in link_groups(items):
+        names = {getattr(r, attr) for r in g}
+        names.discard("")
+        if 1 < len(names) <= LINK_MAX_NAMES:
+            out.append(names)
+    return out
+
+# メーカー名どうしは、同じキー（同じ記事・同じ QID）を直接共有する行の数で同一視する。
+# 行の組を推移的にたどると、モデル名だけのタイトルのような「ハブ」キー1つで無関係なメーカーが
+# 何百もつながるので、キーごとに数え、LINK_MAX_NAMES を超えるメーカー名にまたがるキーは捨てる。
+# 共有するキーの数がこれ以上、かつ少ない方のメーカーの共有キー数のこの割合以上で同一視する
+# （OEM 車の記事1本など、共有が少ないだけでは同一視しない）
+MAKER_LINK_MIN_SHARED = 2
+MAKER_LINK_MIN_RATIO = 0.5
+
+class MakerLinks:
+    # キー → そのキーを持つ行のメーカー名と行数。行は持たないので --spill-dir でも逐次に数えられる
+    def __init__(self):
+        # 1行だけのキーはメーカー名そのもの、2行以上は {メーカー名: 行数}、捨てたキーは None
+        self.keys = {}
+
+    def add(self, ids, maker_norm, count=1):
+        keys = self.keys
+        for k in ids:
+            cur = keys.get(k, "")
+            if cur is None:
+                continue
+            if cur == "":
+                keys[k] = maker_norm if count == 1 else {maker_norm: count}
+                continue
+            if isinstance(cur, str):
+                cur = keys[k] = {cur: 1}
+            cur[maker_norm] = cur.get(maker_norm, 0) + count
+            if len(cur) > LINK_MAX_NAMES:
+                keys[k] = None
+
+    def pairs(self) -> list:
+        # 同一視するメーカー名の組 [{a, b}, ...]
+        per_name = Counter()
+        shared = Counter()
+        for v in self.keys.values():
+            if not isinstance(v, dict):
+                continue
+            names = sorted(v)
+            per_name.update(names)
+            for i, a in enumerate(names):
+                for b in names[i + 1:]:
+                    shared[a, b] += 1
+        return [{a, b} for (a, b), c in shared.items()
+                if c >= MAKER_LINK_MIN_SHARED and c >= MAKER_LINK_MIN_RATIO * min(per_name[a], per_name[b])]
+
+def linked_makers(items) -> list:
+    links = MakerLinks()
+    for r in items:
+        if r.ids and r.maker_norm:
+            links.add(r.ids, r.maker_norm, r.count)
+    return links.pairs()
+
+def rep_key(s: str):
+    # クラスタの代表名（= id）の選び方。ja/en が完全一致キーで混ざったクラスタでも
+    # id が NFKD で濁点の落ちたカタカナ（ホンタ 等）にならないよう ASCII の名前を優先し、その中で最短
+    return (not s.isascii(), len(s), s)
+
+def linked_clusters(names, linked, th=92, block=True, engine="greedy"):
+    # linked の組は先に1つにまとめ、組ごとに代表名（rep_key）1つだけを類似度クラスタに掛ける。
+    # 結果のクラスタは組の全員に広げて返す
+    if not linked:
+        return CLUSTER_ENGINES[engine](names, th, block)
+    sets = DisjointSet()
+    for grp in linked:
+        grp = sorted(grp)
+        for n in grp[1:]:
+            sets.union(grp[0], n)
+    members = {}
+    for ms in sets.groups(names):
+        members[min(ms, key=rep_key)] = ms
+    clusters = CLUSTER_ENGINES[engine](sorted(members), th, block)
+    return [[m for rep in grp for m in members[rep]] for grp in clusters]
+
+# ---------- メーカークラスタ ----------
+def cluster_makers(items, th=92, block=True, engine="greedy", id_join=False, linked=None):
+    # maker_norm 単位→類似名をまとめて1クラスタに
+    # id_join なら同じ車種（完全一致キー）を多く共有するメーカー名は先に同一視する
+    # （linked に linked_makers の結果を渡せば計算し直さない。閾値スイープ用）
+    names = sorted({x.maker_norm for x in items if x.maker_norm})
+    if id_join and linked is None:
+        linked = linked_makers(items)
+    return cluster_maker_names(names, th, block, engine, linked)
+
+def cluster_maker_names(names, th=92, block=True, engine="greedy", linked=None):
+    # names（ソート済みの正規化メーカー名）→ maker map
+    clusters = linked_clusters(names, linked, th, block, engine)
     # map
     maker_map = {}
     for grp in clusters:
-        # 代表を多数決（最短長 or 出現回数最大）
-        rep = sorted(grp, key=lambda s: (len(s), s))[0]
+        rep = min(grp, key=rep_key)
         for g in grp:
             maker_map[g] = rep
     return maker_map
 
 # ---------- モデルクラスタ（メーカー内） ----------
-def cluster_models(items_for_maker, th=92):
-    # 同一メーカー中でモデル名をクラスタリング
-    names = sorted({x["model_norm"] for x in items_for_maker if x["model_norm"]})
-    clusters = []
-    used = set()
-    for i, n in enumerate(names):
-        if n in used:
-            continue
-        group = [n]; used.add(n)
-        for m in names[i+1:]:
-            if m in used:
-                continue
-            score = rf_ratio(n, m)
-            if score >= th:
-                group.append(m); used.add(m)
-        clusters.append(group)
+def cluster_models(items_for_maker, th=92, block=True, engine="greedy", id_join=False, linked=None):
+    # 同一メーカー中でモデル名をクラスタリング（id_join なら完全一致キーの組を先にまとめる）
+    names = sorted({x.model_norm for x in items_for_maker if x.model_norm})
+    if id_join and linked is None:
+        linked = linked_names(items_for_maker, "model_norm")
+    clusters = linked_clusters(names, linked, th, block, engine)
     # map
     model_map = {}
     for grp in clusters:
-        # 代表ラベルは最頻出 or 短い方
-        rep = sorted(grp, key=lambda s: (len(s), s))[0]
+        rep = min(grp, key=rep_key)
         for g in grp:
             model_map[g] = rep
     return model_map
@@ -230,8 +1036,9 @@ def cluster_models(items_for_maker, th=92):
 def merge_cluster(records):
     # 日本語・英語名の推定、別名、年の結合、ソース集約
     # 表示名: en/ja の両方を可能な限り埋める
-    name_en_candidates = []
-    name_ja_candidates = []
+    # 候補名 → 件数（集約された行は count 件分）
+    name_en_candidates = Counter()
+    name_ja_candidates = Counter()
     aliases = set()
     years_list = []
     sources = set()
@@ -239,36 +1046,35 @@ def merge_cluster(records):
     maker_raws = set()
 
     for r in records:
-        kinds.add(r.get("kind"))
-        maker_raws.add(r.get("maker_raw"))
-        y = r.get("years") or {}
-        if y.get("start") or y.get("end"):
-            years_list.append(y)
-        src = r.get("source")
-        if isinstance(src, list):
+        kinds.add(r.kind)
+        maker_raws.add(r.maker_raw)
+        if r.y_start or r.y_end:
+            years_list.append(r)
+        src = r.source
+        if isinstance(src, (list, tuple)):
             for s in src:
                 sources.add(s)
         elif isinstance(src, str):
             sources.add(src)
         # 言語別のモデル名候補
-        rawname = r.get("model_raw") or r.get("model_norm")
-        if r.get("lang") == "en":
+        rawname = r.model_raw or r.model_norm
+        if r.lang == "en":
             if rawname:
-                name_en_candidates.append(rawname)
-        elif r.get("lang") == "ja":
+                name_en_candidates[rawname.strip()] += r.count
+        elif r.lang == "ja":
             if rawname:
-                name_ja_candidates.append(rawname)
+                name_ja_candidates[rawname.strip()] += r.count
         else:
             # 言語未指定（vpic/wdなど）はエイリアス側へ
             if rawname:
                 aliases.add(rawname)
-        aliases.add(r.get("model_norm"))
+        aliases.add(r.model_norm)
 
     # 代表名の決定（頻出順→短さ）
     def pick_name(cands):
         if not cands:
             return None
-        cnt = Counter([c.strip() for c in cands if c]).most_common()
+        cnt = cands.most_common()
         best = sorted([c for c, _ in cnt], key=lambda s: (len(s), s))[0]
         return best
 
@@ -276,8 +1082,8 @@ def merge_cluster(records):
     name_ja = pick_name(name_ja_candidates)
 
     # 年の統合（min start / max end）
-    start_vals = [y.get("start") for y in years_list if y.get("start") is not None]
-    end_vals   = [y.get("end")   for y in years_list if y.get("end") is not None]
+    start_vals = [r.y_start for r in years_list if r.y_start != NO_YEAR]
+    end_vals   = [r.y_end   for r in years_list if r.y_end != NO_YEAR]
     years = {
         "start": min(start_vals) if start_vals else None,
         "end":   max(end_vals)   if end_vals else None,
@@ -296,6 +1102,802 @@ def merge_cluster(records):
     }
     return out
 
+# ---------- メーカー単位の統合 ----------
+def unify_bucket(maker_rep, items, th=92, block=True, engine="greedy", stats=None, split_years=False,
+                 id_join=False):
+    # 1メーカー分のモデルクラスタ→統合。他メーカーに依存しないので並列化できる
+    # split_years なら同名クラスタを年の重なりで世代に分け、世代ごとに1行にする
+    # stats(dict) を渡すとクラスタ・統合それぞれの時間とクラスタサイズを入れる（--profile 用）
+    t0 = time.perf_counter() if stats is not None else 0.0
+    model_map = cluster_models(items, th=th, block=block, engine=engine, id_join=id_join)
+    t1 = time.perf_counter() if stats is not None else 0.0
+    # 代表モデルごとに束ねる
+    clusters = defaultdict(list)
+    for it in items:
+        rep = model_map.get(it.model_norm, it.model_norm)
+        clusters[rep].append(it)
+
+    out = []
+    sizes = []
+    for model_rep, cluster in clusters.items():
+        gens = split_generations(cluster) if split_years else [cluster]
+        for group in gens:
+            out.append(_merge_group(maker_rep, model_rep, group, len(gens) > 1))
+            sizes.append(len(group))
+    if stats is not None:
+        stats.update({
+            "rows": len(items),
+            "names": len(model_map),
+            "clusters": len(sizes),
+            "cluster_s": t1 - t0,
+            "merge_s": time.perf_counter() - t1,
+            "cluster_sizes": sizes,
+        })
+    return out
+
+def _merge_group(maker_rep, model_rep, group, split):
+    merged = merge_cluster(group)
+    merged["maker"] = {
+        "id": maker_rep,               # 名寄せ後の代表名（ID代わり）
+        "aliases": sorted({x.maker_norm for x in group}),
+        "display_candidates": sorted({x.maker_raw for x in group}),
+    }
+    merged["id"] = f"{maker_rep}|{model_rep}"
+    if split:
+        # 世代に分けたときは年の範囲を付けて一意にする（世代どうしの範囲は重ならない）
+        y = merged["years"]
+        merged["id"] += f"|{y['start'] or ''}-{y['end'] or ''}"
+    # 代表モデル名（ID向けに英名優先で付けとく）
+    merged["model"]["id_name"] = (merged["model"]["name_en"] or
+                                  merged["model"]["name_ja"] or
+                                  model_rep)
+    return merged
+
+# 小さいメーカーはこの行数まで1タスクにまとめて投入（プロセス間通信を減らす）
+JOB_BATCH_ROWS = 2000
+
+def _unify_batch(batch, th, block, engine, split_years=False, id_join=False, with_stats=False, sweep=None):
+    # (メーカー, 統合行, 計測値 or None, スイープ集計 or None) のリスト
+    if not (with_stats or sweep):
+        return [(m, unify_bucket(m, items, th, block, engine, None, split_years, id_join), None, None)
+                for m, items in batch]
+    if with_stats:
+        # ワーカープロセスでも rf_ratio の呼び出しを数えられるようにする
+        enable_score_counting()
+    out = []
+    for m, items in batch:
+        st = {} if with_stats else None
+        before = list(SCORE_HIST) if with_stats else None
+        part = None
+        # スイープ時はメーカーごとにスコアのグラフを作り、各閾値と本番の閾値で使い回す
+        with SweepGraphs(min(th, *sweep)) if sweep else nullcontext() as memo:
+            if sweep:
+                linked = linked_names(items, "model_norm") if id_join else None
+                maps = [cluster_models(items, t, block, engine, id_join, linked) for t in sweep]
+            rows = unify_bucket(m, items, th, block, engine, st, split_years, id_join)
+        if sweep:
+            part = {"thresholds": sweep_summary(maps, sweep, f"{m}|"), "scores": memo.counts()}
+        if with_stats:
+            st["score_calls"], st["score_passed"] = score_delta(before, th)
+        out.append((m, rows, st, part))
+    return out
+
+def unify_buckets(buckets, th=92, block=True, engine="greedy", jobs=1, stats=None, split_years=False,
+                  id_join=False, sweep=None, sweeps=None):
+    # メーカー代表名 → 統合行リスト（buckets と同じ順）。
+    # jobs > 1 ならプロセスプールで分散。大きいメーカーから投入して最後に
+    # 巨大バケットだけが残るのを防ぐ。出力は buckets の順に並べ直すので直列実行と同じ
+    # stats(dict) を渡すとメーカーごとの計測値（unify_bucket の stats＋スコア回数）を入れる
+    # sweep（閾値のリスト）を渡すと sweeps(dict) にメーカーごとのスイープ集計を入れる
+    with_stats = stats is not None
+    sweep = tuple(sweep) if sweep else None
+    if jobs <= 1 or len(buckets) <= 1:
+        done = _unify_batch(list(buckets.items()), th, block, engine, split_years, id_join, with_stats,
+                            sweep)
+    else:
+        batches = []
+        cur, cur_rows = [], 0
+        for m in sorted(buckets, key=lambda m: -len(buckets[m])):
+            cur.append((m, buckets[m])); cur_rows += len(buckets[m])
+            if cur_rows >= JOB_BATCH_ROWS:
+                batches.append(cur)
+                cur, cur_rows = [], 0
+        if cur:
+            batches.append(cur)
+
+        done = []
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            futs = [ex.submit(_unify_batch, b, th, block, engine, split_years, id_join, with_stats, sweep)
+                    for b in batches]
+            for fut in as_completed(futs):
+                done.extend(fut.result())
+    results = {}
+    for m, rows, st, part in done:
+        results[m] = rows
+        if with_stats:
+            stats[m] = st
+        if sweeps is not None and part is not None:
+            sweeps[m] = part
+    return {m: results[m] for m in buckets}
+
+# ---------- 閾値スイープ（--sweep-maker-th / --sweep-model-th） ----------
+# 閾値ごとにパイプラインを回し直す代わりに、読み込みは1回、スコアも1回だけ計算して使い回す。
+# 最も低い閾値で候補ペアのスコアを計算して辺として持ち（ScoreGraph）、各閾値のクラスタは
+# 辺を絞ってなめるだけで作る。エンジンごとの規則（貪欲法の順序・候補条件）を辺の上で
+# なぞるので各閾値の結果は単独実行と一致し、出力は本番の --maker-th / --model-th の分だけ書く
+SWEEP_VERSION = 1
+SWEEP_TOP = 10  # 閾値ごとに載せる大きいクラスタ・分かれた（くっついた）クラスタの数
+
+def parse_thresholds(text) -> list:
+    # "85,88,90" → [85, 88, 90]（昇順・重複なし）
+    try:
+        ths = sorted({int(x) for x in text.split(",") if x.strip()})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"閾値はカンマ区切りの整数で指定してください: {text}")
+    if not ths or not all(0 <= t <= 100 for t in ths):
+        raise argparse.ArgumentTypeError(f"閾値は 0〜100 で指定してください: {text}")
+    return ths
+
+class ScoreGraph:
+    # names どうしの「スコア floor 以上」の辺を1回だけ作り、
+    # floor 以上の任意の閾値のクラスタを辺をなめるだけで再現する。
+    # BlockIndex は閾値以上のペアを必ず候補に含むので、floor の索引で拾った辺を
+    # スコアで絞るだけで各閾値の候補判定と一致する
+    def __init__(self, names, floor, engine="greedy", block=True):
+        self.names = names
+        self.floor = floor
+        self.engine = engine
+        n = len(names)
+        adj = self.adj = [[] for _ in range(n)]  # i → [(j, スコア)]（j > i 昇順）
+        self.scored = 0
+        if engine == "matrix":
+            for i, j, sc in matrix_edges(names, floor):
+                adj[i].append((j, sc))
+            return
+        # スコアは対称なので、各名前は後ろの名前とだけまとめて比べる
+        # uf は名前数によらず、貪欲法は BLOCK_MIN_NAMES 以上のときだけ索引を使う
+        if not block or (engine == "greedy" and n < BLOCK_MIN_NAMES):
+            self.scored = n * (n - 1) // 2
+            for i, a in enumerate(names):
+                for j, sc in enumerate(rf_scores(a, names[i + 1:], floor), i + 1):
+                    if sc >= floor:
+                        adj[i].append((j, sc))
+            return
+        index = BlockIndex(names, floor)
+        keys = index.keys
+        for i, a in enumerate(names):
+            cands = [j for j in index.candidates(a, keys[i]) if j > i]
+            self.scored += len(cands)
+            for j, sc in zip(cands, rf_scores(a, [names[j] for j in cands], floor)):
+                if sc >= floor:
+                    adj[i].append((j, sc))
+
+    def edges(self, th):
+        # 閾値 th で使われる辺 (i, j)
+        if th < self.floor:
+            raise ValueError(f"threshold {th} is below the sweep floor {self.floor}")
+        for i, es in enumerate(self.adj):
+            for j, sc in es:
+                if sc >= th:
+                    yield i, j
+
+    def clusters(self, th) -> list:
+        # 各エンジンのクラスタの作り方（greedy_groups / edge_components / uf_components）に辺を渡す
+        if self.engine == "greedy":
+            adj = {}
+            for i, j in self.edges(th):
+                adj.setdefault(i, []).append(j)
+            return greedy_groups(self.names, lambda i, done: adj.get(i, ()))
+        if self.engine == "uf":
+            return uf_components(self.names, self.edges(th))
+        return edge_components(self.names, self.edges(th))
+
+class SweepGraphs:
+    # with の間だけ CLUSTER_ENGINES を ScoreGraph 経由の版に差し替える。
+    # 同じ名前リストのクラスタリングは閾値が違っても1つのグラフを使い回す
+    def __init__(self, floor):
+        self.floor = floor
+        self.graphs = {}
+        self.runs = 0
+        self.originals = {}
+
+    def _engine(self, name):
+        def run(names, th=92, block=True):
+            key = (name, block, tuple(names))
+            g = self.graphs.get(key)
+            if g is None:
+                g = self.graphs[key] = ScoreGraph(list(names), self.floor, name, block)
+            self.runs += 1
+            return g.clusters(th)
+        return run
+
+    def counts(self) -> dict:
+        # 実際に計算したスコア数（matrix は cdist 分を含まない）、残した辺の数、クラスタリング回数
+        return {"scored": sum(g.scored for g in self.graphs.values()),
+                "edges": sum(len(es) for g in self.graphs.values() for es in g.adj),
+                "runs": self.runs}
+
+    def __enter__(self):
+        self.originals = dict(CLUSTER_ENGINES)
+        CLUSTER_ENGINES.update({name: self._engine(name) for name in self.originals})
+        return self
+
+    def __exit__(self, *exc):
+        CLUSTER_ENGINES.update(self.originals)
+
+def _pairs(n: int) -> int:
+    return n * (n - 1) // 2
+
+def _flip_summary(lo, hi, prefix, top):
+    # 閾値 lo → hi（名前 → 代表名）で、同じクラスタでなくなった組・新たに同じになった組
+    if lo == hi:
+        return {"split_pairs": 0, "joined_pairs": 0, "splits": [], "joins": []}
+    both = Counter((lo[n], hi[n]) for n in lo)
+    lo_sizes = Counter(lo.values())
+    hi_sizes = Counter(hi.values())
+    split = defaultdict(list)
+    joined = defaultdict(list)
+    for (a, b), c in both.items():
+        split[a].append((b, c))
+        joined[b].append((a, c))
+
+    def changed(parts, sizes):
+        out = []
+        for rep, subs in parts.items():
+            if len(subs) > 1:
+                out.append({"rep": prefix + rep, "size": sizes[rep],
+                            "pairs": _pairs(sizes[rep]) - sum(_pairs(c) for _, c in subs),
+                            "parts": sorted(prefix + r for r, _ in subs)[:top]})
+        out.sort(key=lambda e: (-e["pairs"], e["rep"]))
+        return out
+
+    splits = changed(split, lo_sizes)
+    joins = changed(joined, hi_sizes)
+    return {
+        "split_pairs": sum(e["pairs"] for e in splits),
+        "joined_pairs": sum(e["pairs"] for e in joins),
+        "splits": splits[:top],
+        "joins": joins[:top],
+    }
+
+def sweep_summary(maps, ths, prefix="", top=SWEEP_TOP) -> list:
+    # 閾値ごとの map（名前 → 代表名）から、クラスタ数・大きいクラスタ・次の閾値との差分を作る
+    out = []
+    for k, (th, mp) in enumerate(zip(ths, maps)):
+        sizes = Counter(mp.values())
+        merged = sorted(((n, rep) for rep, n in sizes.items() if n > 1), key=lambda x: (-x[0], x[1]))
+        ent = {
+            "th": th,
+            "names": len(mp),
+            "clusters": len(sizes),
+            "merged_names": sum(n for n, _ in merged),
+            "largest": [{"rep": prefix + rep, "size": n} for n, rep in merged[:top]],
+        }
+        if k + 1 < len(maps):
+            ent["next"] = _flip_summary(mp, maps[k + 1], prefix, top)
+        out.append(ent)
+    return out
+
+def merge_sweeps(parts, top=SWEEP_TOP) -> dict:
+    # メーカーごとのスイープ集計（_unify_batch の part）を1つにまとめる
+    parts = list(parts)
+    if not parts:
+        return {"thresholds": [], "scores": {"scored": 0, "edges": 0, "runs": 0}}
+
+    def top_by(items, key):
+        return sorted(items, key=key)[:top]
+
+    out = []
+    for k, ent in enumerate(parts[0]["thresholds"]):
+        ents = [p["thresholds"][k] for p in parts]
+        m = {
+            "th": ent["th"],
+            "names": sum(e["names"] for e in ents),
+            "clusters": sum(e["clusters"] for e in ents),
+            "merged_names": sum(e["merged_names"] for e in ents),
+            "largest": top_by([x for e in ents for x in e["largest"]], lambda x: (-x["size"], x["rep"])),
+        }
+        if "next" in ent:
+            nx = [e["next"] for e in ents]
+            m["next"] = {
+                "split_pairs": sum(x["split_pairs"] for x in nx),
+                "joined_pairs": sum(x["joined_pairs"] for x in nx),
+                "splits": top_by([y for x in nx for y in x["splits"]], lambda y: (-y["pairs"], y["rep"])),
+                "joins": top_by([y for x in nx for y in x["joins"]], lambda y: (-y["pairs"], y["rep"])),
+            }
+        out.append(m)
+    scores = {key: sum(p["scores"][key] for p in parts) for key in ("scored", "edges", "runs")}
+    return {"thresholds": out, "scores": scores}
+
+def print_sweep(label, sweep):
+    ents = sweep["thresholds"]
+    for k, e in enumerate(ents):
+        line = (f"sweep {label} th {e['th']}: {e['clusters']} clusters from {e['names']} names "
+                f"({e['merged_names']} merged)")
+        if "next" in e:
+            line += (f"; -> th {ents[k + 1]['th']}: {e['next']['split_pairs']} pairs split, "
+                     f"{e['next']['joined_pairs']} joined")
+        print(line)
+    sc = sweep["scores"]
+    print(f"sweep {label}: {sc['scored']} scores computed, {sc['edges']} edges kept, "
+          f"{sc['runs']} clusterings")
+
+# ---------- 差分実行（--state） ----------
+# 前回の maker map とメーカーごとの統合結果を、入力内容のハッシュ付きで保存しておき、
+# 次回はメンバーが変わったメーカーだけクラスタし直す。
+# 形式やロジックを変えたら STATE_VERSION を上げて古い state を無効にする
+STATE_VERSION = 3
+
+def row_digest(r) -> bytes:
+    # 統合結果に効くフィールドだけのハッシュ（行の空白や raw の無関係な項目は無視）
+    h = hashlib.blake2b(digest_size=16)
+    for v in (r.maker_raw, r.maker_norm, r.model_raw, r.model_norm, r.y_start, r.y_end,
+              r.kind, r.lang, r.source, r.ids, r.count):
+        h.update(repr(v).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.digest()
+
+def bucket_digest(items) -> str:
+    # 行の並びも出力順に効くので順序込みでハッシュする
+    h = hashlib.blake2b(digest_size=16)
+    for r in items:
+        h.update(row_digest(r))
+    return h.hexdigest()
+
+def names_digest(names) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for n in sorted(names):
+        h.update(n.encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+def load_state(path, params):
+    # params（閾値・エンジン等）が前回と違えば使わない
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            st = json_loads(f.read())
+    except Exception:
+        return None
+    if st.get("version") != STATE_VERSION or st.get("params") != params:
+        return None
+    return st
+
+def save_state(path, st):
+    # 途中で落ちても前回の state を壊さないよう一時ファイル→rename
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(json_dumps(st))
+    os.replace(tmp, path)
+
+# ---------- メーカー別シャード出力（--shards） ----------
+# フロントが必要なメーカーだけ取得できるよう、メーカーごとの JSONL と
+# 事前圧縮版(.gz/.br)、件数・サイズ・ハッシュを載せた manifest.json を書く。
+# ファイル名に内容ハッシュを含めるので、CDN 側では immutable でキャッシュできる
+SHARD_MANIFEST = "manifest.json"
+
+def shard_slug(maker_rep: str) -> str:
+    # 日本語名などでも衝突しないよう、ASCII 化した名前＋元の名前の短いハッシュ
+    slug = re.sub(r"[^a-z0-9]+", "-", ascii_fold(maker_rep).lower()).strip("-")[:40]
+    tag = hashlib.blake2b(maker_rep.encode("utf-8"), digest_size=4).hexdigest()
+    return f"{slug or 'maker'}-{tag}"
+
+def _write_bytes(path, data: bytes):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def write_shards(dirpath, per_maker):
+    os.makedirs(dirpath, exist_ok=True)
+    man_path = os.path.join(dirpath, SHARD_MANIFEST)
+    old_files = set()
+    if os.path.exists(man_path):
+        try:
+            with open(man_path, "r", encoding="utf-8") as f:
+                for sh in json.load(f).get("shards", []):
+                    old_files.update(sh["files"].values())
+        except Exception:
+            pass
+
+    shards = []
+    for maker_rep, rows in per_maker.items():
+        data = dump_jsonl_lines(rows)
+        sha = hashlib.sha256(data).hexdigest()
+        base = f"{shard_slug(maker_rep)}.{sha[:12]}.jsonl"
+        blobs = {"jsonl": data, "gz": gzip.compress(data, compresslevel=9, mtime=0)}
+        if HAVE_BROTLI:
+            blobs["br"] = brotli.compress(data, quality=11)
+        files, sizes = {}, {}
+        for enc, blob in blobs.items():
+            name = base if enc == "jsonl" else f"{base}.{enc}"
+            path = os.path.join(dirpath, name)
+            if not os.path.exists(path):
+                # 同じハッシュのファイルは中身も同じなので書き直さない
+                _write_bytes(path, blob)
+            files[enc] = name
+            sizes[enc] = len(blob)
+        shards.append({
+            "maker": maker_rep,
+            "rows": len(rows),
+            "sha256": sha,
+            "files": files,
+            "bytes": sizes,
+        })
+
+    manifest = {
+        "version": 1,
+        "total_rows": sum(sh["rows"] for sh in shards),
+        "shards": shards,
+    }
+    _write_bytes(man_path, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+    # 前回の manifest にしか載っていないシャードは消す
+    keep = {n for sh in shards for n in sh["files"].values()}
+    for name in old_files - keep:
+        try:
+            os.remove(os.path.join(dirpath, name))
+        except OSError:
+            pass
+    return manifest
+
+# ---------- 検索インデックス（--search-index） ----------
+# オートコンプリート用に、統合行の表示名・別名をトークン化した転置インデックスを書く。
+#   docs:     統合行（rank 降順に並べ替え済み。doc 番号が小さいほど上位）
+#   terms:    ソート済みトークン一覧（前方一致は二分探索で範囲を取るだけで済む）
+#   postings: terms と同じ並びの doc 番号リスト（昇順 = rank 順）
+# トークン化はクライアントと揃えること: NFKD で結合文字を落として小文字化し、\w+ で分割
+SEARCH_INDEX_VERSION = 1
+_RE_SEARCH_TOKEN = re.compile(r"\w+")
+
+def search_tokens(s) -> list:
+    if not s:
+        return []
+    return _RE_SEARCH_TOKEN.findall(ascii_fold(s).lower())
+
+def search_rank(row) -> int:
+    # 出典が多いほど・別名が多いほど（= よく知られた車種ほど）上位
+    return len(row["sources"]) * 100 + min(len(row["model"]["aliases"]), 99)
+
+def build_search_index(rows) -> dict:
+    order = sorted(range(len(rows)), key=lambda i: (-search_rank(rows[i]), rows[i]["id"]))
+    docs = {"id": [], "label": [], "rank": []}
+    postings = defaultdict(set)
+    for d, i in enumerate(order):
+        r = rows[i]
+        model = r["model"]
+        label_model = model["name_ja"] or model["name_en"] or model["id_name"]
+        docs["id"].append(r["id"])
+        docs["label"].append(f"{r['maker_display']} {label_model}")
+        docs["rank"].append(search_rank(r))
+        names = [r["maker_display"], model["name_en"], model["name_ja"], model["id_name"]]
+        names += r["maker"]["aliases"] + model["aliases"]
+        for name in names:
+            for t in search_tokens(name):
+                postings[t].add(d)
+    terms = sorted(postings)
+    return {
+        "version": SEARCH_INDEX_VERSION,
+        "docs": docs,
+        "terms": terms,
+        "postings": [sorted(postings[t]) for t in terms],
+    }
+
+def write_search_index(path, rows) -> dict:
+    idx = build_search_index(rows)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    _write_bytes(path, json_dumps(idx))
+    return idx
+
+# ---------- ディスク退避モード（--spill-dir） ----------
+# 全行をメモリに載せずに処理する。読み込んだ行はその場で退避ファイルへ書き、メモリには
+# メーカー名の集合と完全一致キーごとのメーカー名（MakerLinks）だけ残す。メーカー名寄せの後、
+# 代表メーカー名のハッシュで SPILL_PARTITIONS 個に振り分け直し、1パーティションずつ
+# 読み戻してモデルクラスタ→統合する。メーカーは1つのパーティションに収まるので結果は
+# 通常モードと同じで、最後にメーカーの先頭行の順に並べ直して --out に書く
+# （退避ファイルの読み書き・振り分けは catalog_spill.py）
+def run_spilled(args, specs, stage, read_stats, profile=False) -> dict:
+    # main() の 1)〜4) を退避ファイル経由で行う。戻り値は件数（--profile 用）
+    block, id_join = not args.no_block, not args.no_id_join
+    os.makedirs(args.spill_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix="spill-", dir=args.spill_dir)
+    try:
+        # 0) 読み込みながら (行番号, Row の材料, ref) を書き出す
+        rows_path = os.path.join(tmp, "rows.spill")
+        names = set()
+        links = MakerLinks() if id_join else None
+        n = 0
+        with stage("ingest") as st:
+            w = SpillWriter(rows_path)
+            for f, ref in iter_ingest_many(specs, jobs=args.jobs, stats=read_stats):
+                w.add((n, f, ref))
+                names.add(f[1])
+                if links is not None and f[11] and f[1]:
+                    links.add(f[11], f[1])
+                n += 1
+            w.close()
+            st["rows"] = n
+        warn_malformed(read_stats)
+        if not n:
+            print("No input rows.", file=sys.stderr)
+            sys.exit(1)
+
+        # 1) メーカー名寄せ
+        with stage("cluster_makers") as st:
+            linked = links.pairs() if links is not None else None
+            maker_map = cluster_maker_names(sorted(names), args.maker_th, block, args.engine, linked)
+            if profile:
+                st["clusters"] = {"count": len(set(maker_map.values())),
+                                  "size_hist": size_histogram(Counter(maker_map.values()).values())}
+        del names, links, linked
+        if args.makers:
+            write_maker_map(args.makers, maker_map)
+
+        # 2) 代表メーカー名で振り分け直す（パーティション内は行番号順のまま）
+        with stage("partition"):
+            parts = [SpillWriter(os.path.join(tmp, f"part{i:03d}.spill")) for i in range(SPILL_PARTITIONS)]
+            for rec in iter_spill(rows_path):
+                m = rec[1][1]
+                parts[spill_partition(maker_map.get(m, m))].add(rec)
+            for w in parts:
+                w.close()
+            os.remove(rows_path)
+
+        # 3) パーティションごとにモデルクラスタ→統合し、メーカーごとの出力を結果ファイルに足す
+        index = []  # (メーカーの先頭の行番号, 結果ファイル内の位置, 長さ)
+        distinct = unified = 0
+        bucket_stats = {} if profile else None
+        with stage("cluster_models") as st, open(os.path.join(tmp, "unified.part"), "wb") as out:
+            for w in parts:
+                buckets, first = {}, {}
+                for seq, f, ref in iter_spill(w.path):
+                    r = make_row(f, ref)
+                    r.maker_rep = m = maker_map.get(r.maker_norm, r.maker_norm)
+                    b = buckets.get(m)
+                    if b is None:
+                        buckets[m] = b = []
+                        first[m] = seq
+                    b.append(r)
+                os.remove(w.path)
+                if not args.no_dedup:
+                    buckets = {m: collapse_duplicates(items) for m, items in buckets.items()}
+                distinct += sum(len(items) for items in buckets.values())
+                done = unify_buckets(buckets, th=args.model_th, block=block, engine=args.engine,
+                                     jobs=args.jobs, stats=bucket_stats,
+                                     split_years=args.split_years, id_join=id_join)
+                del buckets
+                for m, rows in done.items():
+                    data = dump_jsonl_lines(rows)
+                    index.append((first[m], out.tell(), len(data)))
+                    out.write(data)
+                    unified += len(rows)
+            if profile:
+                st.update(bucket_profile(bucket_stats))
+                st["buckets"] = len(index)
+        if not args.no_dedup:
+            print(f"dedup: {n} rows -> {distinct} distinct")
+
+        # 4) 通常モードと同じメーカー順（先頭行の順）に並べて書く
+        with stage("write"):
+            index.sort()
+            os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+            with open(os.path.join(tmp, "unified.part"), "rb") as src, open(args.out, "wb") as dst:
+                for _, off, size in index:
+                    src.seek(off)
+                    dst.write(src.read(size))
+            print(f"wrote {unified} rows -> {args.out}")
+        return {"rows": n, "distinct_rows": distinct, "unified_rows": unified}
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+# ---------- プロファイル（--profile） ----------
+# 段階ごとの wall/CPU 時間と RSS、rf_ratio の比較回数と閾値通過数、クラスタサイズ分布、
+# 大きいメーカー上位の所要時間を JSON に書く。計測用の差し替え（rf_ratio・json_loads・
+# 正規化関数）は有効時にだけ行うので、無効時は段階の区切りの分岐程度しかかからない
+PROFILE_VERSION = 1
+PROFILE_TOP_BUCKETS = 10
+
+try:
+    import resource
+    HAVE_RESOURCE = True
+except Exception:
+    HAVE_RESOURCE = False
+
+# rf_ratio / rf_scores のスコア（整数に切り捨て）ごとの比較回数。None なら数えない
+# （rf_scores の cutoff 未満は 0 として数える）
+SCORE_HIST = None
+_plain_rf_ratio = rf_ratio
+_plain_rf_scores = rf_scores
+
+def _counted_rf_ratio(a: str, b: str) -> int:
+    s = _plain_rf_ratio(a, b)
+    SCORE_HIST[min(100, int(s))] += 1
+    return s
+
+def _counted_rf_scores(a: str, bs, cutoff=0) -> list:
+    out = _plain_rf_scores(a, bs, cutoff)
+    for s in out:
+        SCORE_HIST[min(100, int(s))] += 1
+    return out
+
+def enable_score_counting():
+    global SCORE_HIST, rf_ratio, rf_scores
+    if SCORE_HIST is None:
+        SCORE_HIST = [0] * 101
+        rf_ratio = _counted_rf_ratio
+        rf_scores = _counted_rf_scores
+
+def count_scores(scores, calls):
+    # rf_ratio を通らない比較（matrix エンジン）の分。scores は閾値以上のスコアだけ
+    for v in scores:
+        SCORE_HIST[min(100, int(v))] += 1
+    SCORE_HIST[0] += calls - len(scores)
+
+def score_delta(before, th):
+    # before 以降の (比較回数, 閾値以上の回数)。閾値は整数なので切り捨てたスコアで判定できる
+    diff = [a - b for a, b in zip(SCORE_HIST, before)]
+    return sum(diff), sum(diff[th:])
+
+def size_histogram(sizes) -> dict:
+    # クラスタサイズの分布（1, 2, 3-4, 5-8, ... の2冪区切り）
+    hist = Counter()
+    for n in sizes:
+        hi = 1 << max(0, n - 1).bit_length()
+        hist[hi] += 1
+    return {(str(hi) if hi <= 2 else f"{hi // 2 + 1}-{hi}"): hist[hi] for hi in sorted(hist)}
+
+def _rss_kib():
+    # 現在の RSS（Linux の /proc のみ。取れなければ None）
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except Exception:
+        return None
+
+def _max_rss_kib(children=False):
+    # その時点までの最大 RSS（Linux は KiB、macOS はバイトで返るので揃える）
+    if not HAVE_RESOURCE:
+        return None
+    v = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return v // 1024 if sys.platform == "darwin" else v
+
+class Profiler:
+    def __init__(self, cprofile_dir=None):
+        self.stages = {}
+        self.timers = Counter()
+        self.cprofile_dir = cprofile_dir
+        self.cprofile_files = {}
+        self.originals = {}
+        self.t0 = (time.perf_counter(), os.times())
+
+    def instrument(self):
+        # 解析・正規化の時間を分けて測るため、モジュール関数を計測版に差し替える
+        enable_score_counting()
+        g = globals()
+        for name, key in (("json_loads", "parse"), ("norm_maker_name", "normalize"),
+                          ("norm_model_name", "normalize")):
+            self.originals[name] = fn = g[name]
+            g[name] = self._timed(fn, key)
+
+    def restore(self):
+        globals().update(self.originals)
+        self.originals = {}
+
+    def _timed(self, fn, key):
+        timers = self.timers
+        clock = time.perf_counter
+
+        @wraps(fn)
+        def timed(*a):
+            t = clock()
+            try:
+                return fn(*a)
+            finally:
+                timers[key] += clock() - t
+        return timed
+
+    @contextmanager
+    def stage(self, name):
+        prof = None
+        if self.cprofile_dir:
+            import cProfile
+            prof = cProfile.Profile()
+        timers = dict(self.timers)
+        wall, cpu = time.perf_counter(), os.times()
+        if prof:
+            prof.enable()
+        try:
+            yield self.stages.setdefault(name, {})
+        finally:
+            if prof:
+                prof.disable()
+                os.makedirs(self.cprofile_dir, exist_ok=True)
+                path = os.path.join(self.cprofile_dir, f"{name}.prof")
+                prof.dump_stats(path)
+                self.cprofile_files[name] = path
+            now = os.times()
+            st = self.stages[name]
+            st["wall_s"] = time.perf_counter() - wall
+            st["cpu_s"] = (now.user - cpu.user) + (now.system - cpu.system)
+            st["children_cpu_s"] = ((now.children_user - cpu.children_user) +
+                                    (now.children_system - cpu.children_system))
+            st["rss_kib"] = _rss_kib()
+            st["max_rss_kib"] = _max_rss_kib()
+            for key, v in self.timers.items():
+                if v != timers.get(key, 0.0):
+                    st[f"{key}_s"] = v - timers.get(key, 0.0)
+
+    def report(self, **extra) -> dict:
+        now = os.times()
+        wall0, cpu0 = self.t0
+        rep = {
+            "version": PROFILE_VERSION,
+            "argv": sys.argv[1:],
+            "have_rapidfuzz": HAVE_RF,
+            "json_backend": JSON_BACKEND,
+            "total": {
+                "wall_s": time.perf_counter() - wall0,
+                "cpu_s": (now.user - cpu0.user) + (now.system - cpu0.system),
+                "children_cpu_s": ((now.children_user - cpu0.children_user) +
+                                   (now.children_system - cpu0.children_system)),
+                "max_rss_kib": _max_rss_kib(),
+                "children_max_rss_kib": _max_rss_kib(children=True),
+            },
+            "stages": self.stages,
+        }
+        rep.update(extra)
+        if self.cprofile_files:
+            rep["cprofile"] = self.cprofile_files
+        return rep
+
+def emit_changefeed(args, prev_catalog):
+    c = write_changefeed(args.changefeed, prev_catalog, args.out)
+    print(f"changefeed: +{c['added']} ~{c['changed']} -{c['removed']} "
+          f"({c['remaps']} remaps, {c['unchanged']} unchanged) -> {args.changefeed}")
+
+def write_maker_map(path, maker_map):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(maker_map, f, ensure_ascii=False, indent=2)
+
+def warn_malformed(read_stats):
+    for p, st in read_stats.items():
+        if st["malformed"]:
+            print(f"warning: {p}: skipped {st['malformed']} malformed lines "
+                  f"({st['rows']} parsed)", file=sys.stderr)
+
+def bucket_profile(bucket_stats, top=PROFILE_TOP_BUCKETS) -> dict:
+    # unify_buckets(stats=...) の結果を、スコア集計・クラスタ分布・上位メーカーにまとめる
+    sizes = [n for st in bucket_stats.values() for n in st["cluster_sizes"]]
+    largest = sorted(bucket_stats, key=lambda m: (-bucket_stats[m]["rows"], m))[:top]
+    return {
+        "scores": {
+            "calls": sum(st["score_calls"] for st in bucket_stats.values()),
+            "passed": sum(st["score_passed"] for st in bucket_stats.values()),
+        },
+        "clusters": {
+            "count": len(sizes),
+            "size_hist": size_histogram(sizes),
+        },
+        "top_buckets": [
+            {"maker": m, **{k: v for k, v in bucket_stats[m].items() if k != "cluster_sizes"}}
+            for m in largest
+        ],
+    }
+
+def finish(args, prof, **counts):
+    if prof:
+        prof.restore()
+        report = prof.report(**counts, norm_cache=norm_cache_stats())
+        os.makedirs(os.path.dirname(args.profile) or ".", exist_ok=True)
+        _write_bytes(args.profile, json.dumps(report, ensure_ascii=False, indent=2).encode("utf-8"))
+        print(f"wrote profile -> {args.profile}")
+    st = norm_cache_stats()
+    print("norm cache: " + " / ".join(
+        f"{k} hit {v['hits']} miss {v['misses']}" for k, v in st.items()))
+    print("done.")
+
 # ---------- メイン ----------
 def main():
     ap = argparse.ArgumentParser()
@@ -308,71 +1910,219 @@ def main():
     ap.add_argument("--makers", default=None, help="メーカー名寄せマップの保存先（debug用）")
     ap.add_argument("--maker-th", type=int, default=92)
     ap.add_argument("--model-th", type=int, default=92)
+    ap.add_argument("--no-block", action="store_true", help="候補ブロッキングを無効化して全ペア比較する（検証用）")
+    ap.add_argument("--no-id-join", action="store_true",
+                    help="QID・pageid・タイトル・言語間リンクの完全一致による事前結合を無効化する（検証用）")
+    ap.add_argument("--no-dedup", action="store_true",
+                    help="内容が同じ入力行を1行にまとめる集約を無効化する（検証用）")
+    ap.add_argument("--engine", choices=sorted(CLUSTER_ENGINES), default="greedy",
+                    help="クラスタリング方式（greedy: 逐次比較 / matrix: cdist 行列＋連結成分 / "
+                         "uf: 逐次挿入の union-find、入力順に依存しない）")
+    ap.add_argument("--jobs", type=int, default=1, help="読み込み・モデルクラスタの並列プロセス数")
+    ap.add_argument("--split-years", action="store_true",
+                    help="同名モデルを年の重なりで世代に分けて別の行にする（id に年の範囲が付く）")
+    ap.add_argument("--shards", default=None,
+                    help="メーカー別シャード（.jsonl/.gz/.br）と manifest.json の出力先ディレクトリ")
+    ap.add_argument("--search-index", default=None,
+                    help="オートコンプリート用の検索インデックス(JSON)の出力先")
+    ap.add_argument("--snapshot", default=None,
+                    help="mmap で開けるバイナリスナップショット（catalog_snapshot.py で読む）の出力先")
+    ap.add_argument("--sqlite", default=None,
+                    help="統合結果を正規化テーブル＋FTS5 検索つきの SQLite ファイルにも書く")
+    ap.add_argument("--sweep-maker-th", type=parse_thresholds, default=None,
+                    help="メーカー閾値のスイープ（例: 85,88,90,92,95）。スコアは1回だけ計算し、"
+                         "閾値ごとのクラスタ数・大きいクラスタ・次の閾値で分かれる組を出す")
+    ap.add_argument("--sweep-model-th", type=parse_thresholds, default=None,
+                    help="モデル閾値のスイープ（--maker-th でのメーカー分けに対して）")
+    ap.add_argument("--sweep-report", default=None, help="スイープ結果(JSON)の出力先")
+    ap.add_argument("--state", default=None,
+                    help="差分実行用の状態ファイル。変更のあったメーカーだけ再クラスタする")
+    ap.add_argument("--spill-dir", default=None,
+                    help="行を一時ファイルに退避してメーカー単位で処理するディスク退避モードの作業場所。"
+                         "メモリに載らない規模の入力向け（--state / --shards / --search-index / "
+                         "--snapshot / --sqlite / スイープとは併用できない）")
+    ap.add_argument("--prev", default=None,
+                    help="前回の統合結果(JSONL)。--changefeed で今回の --out との差分を書く（--out と同じパスでもよい）")
+    ap.add_argument("--changefeed", default=None,
+                    help="前回からの追加・変更・削除と id の付け替え（remap）を書く JSONL の出力先")
+    ap.add_argument("--json-backend", choices=("auto", "orjson", "json"), default="auto",
+                    help="JSON の読み書きに使うライブラリ（auto: orjson があれば orjson）")
+    ap.add_argument("--profile", default=None,
+                    help="段階別の時間・メモリ・比較回数などの計測レポート(JSON)の出力先")
+    ap.add_argument("--profile-cprofile", default=None,
+                    help="--profile 時に段階ごとの cProfile ダンプを置くディレクトリ（並列ワーカー内は対象外）")
     args = ap.parse_args()
+    if args.engine == "matrix" and not (HAVE_RF and HAVE_NP):
+        ap.error("--engine matrix には rapidfuzz と numpy が必要です")
+    if args.json_backend == "orjson" and not HAVE_ORJSON:
+        ap.error("--json-backend orjson には orjson が必要です")
+    if args.profile_cprofile and not args.profile:
+        ap.error("--profile-cprofile は --profile と一緒に指定してください")
+    if (args.sweep_maker_th or args.sweep_model_th) and args.state:
+        ap.error("--sweep-maker-th / --sweep-model-th は --state と併用できません")
+    if args.sweep_report and not (args.sweep_maker_th or args.sweep_model_th):
+        ap.error("--sweep-report は --sweep-maker-th か --sweep-model-th と一緒に指定してください")
+    if args.spill_dir:
+        bad = [opt for opt, v in (("--state", args.state), ("--shards", args.shards),
+                                  ("--search-index", args.search_index), ("--snapshot", args.snapshot),
+                                  ("--sqlite", args.sqlite), ("--sweep-maker-th", args.sweep_maker_th),
+                                  ("--sweep-model-th", args.sweep_model_th)) if v]
+        if bad:
+            ap.error(f"--spill-dir は {' / '.join(bad)} と併用できません")
+    if bool(args.prev) != bool(args.changefeed):
+        ap.error("--prev と --changefeed は一緒に指定してください")
+    set_json_backend(args.json_backend)
+    prof = None
+    if args.profile:
+        prof = Profiler(args.profile_cprofile)
+        prof.instrument()
+    stage = prof.stage if prof else (lambda name: nullcontext({}))
 
-    rows = []
-    # vPIC
-    if args.vpic:
-        rows += ingest([args.vpic], lang=None, source_tag="vpic")
-    # Wikipedia
-    if args.wiki_ja:
-        rows += ingest(args.wiki_ja, lang="ja", source_tag="ja.wikipedia")
-    if args.wiki_en:
-        rows += ingest(args.wiki_en, lang="en", source_tag="en.wikipedia")
-    # Wikidata（車・バイクどちらも読み込むが、今回はkind使わず統合のみ）
-    if args.wd_cars:
-        rows += ingest([args.wd_cars], lang=None, source_tag="wikidata")
-    if args.wd_bikes:
-        rows += ingest([args.wd_bikes], lang=None, source_tag="wikidata")
+    read_stats = {}
+    specs = [
+        # vPIC
+        ([args.vpic] if args.vpic else [], None, "vpic"),
+        # Wikipedia
+        (args.wiki_ja, "ja", "ja.wikipedia"),
+        (args.wiki_en, "en", "en.wikipedia"),
+        # Wikidata（車・バイクどちらも読み込むが、今回はkind使わず統合のみ）
+        ([args.wd_cars] if args.wd_cars else [], None, "wikidata"),
+        ([args.wd_bikes] if args.wd_bikes else [], None, "wikidata"),
+    ]
+    # --out を上書きする前に読んでおく
+    prev_catalog = load_prev_catalog(args.prev) if args.prev else None
+    if args.spill_dir:
+        counts = run_spilled(args, specs, stage, read_stats, profile=bool(prof))
+        if prev_catalog is not None:
+            with stage("changefeed"):
+                emit_changefeed(args, prev_catalog)
+        finish(args, prof, **counts)
+        return
+    with stage("ingest"):
+        rows = ingest_many(specs, jobs=args.jobs, stats=read_stats)
+    warn_malformed(read_stats)
 
     if not rows:
         print("No input rows.", file=sys.stderr)
         sys.exit(1)
+    input_rows = len(rows)
+    if not args.no_dedup:
+        with stage("dedup") as st:
+            rows = collapse_duplicates(rows)
+            st["rows"] = len(rows)
+        print(f"dedup: {input_rows} rows -> {len(rows)} distinct")
+
+    params = {"maker_th": args.maker_th, "model_th": args.model_th,
+              "engine": args.engine, "block": not args.no_block,
+              "split_years": args.split_years, "id_join": not args.no_id_join}
+    state = load_state(args.state, params) if args.state else None
 
-    # 1) メーカー名寄せ
-    maker_map = cluster_makers(rows, th=args.maker_th)
+    # 1) メーカー名寄せ（--state でメーカー名集合が前回と同じなら再利用）
+    mdigest = None
+    if args.state:
+        # 完全一致キーでつながるメーカー名の組も maker map に効くので一緒にハッシュする
+        links = linked_makers(rows) if not args.no_id_join else []
+        mdigest = names_digest({r.maker_norm for r in rows} | {"\x1e".join(sorted(g)) for g in links})
+    reuse_makers = bool(state) and state["makers"]["digest"] == mdigest
+    sweep_report = {}
+    with stage("cluster_makers") as st:
+        before = list(SCORE_HIST) if prof else None
+        if reuse_makers:
+            maker_map = state["makers"]["map"]
+        elif args.sweep_maker_th:
+            ths = args.sweep_maker_th
+            linked = linked_makers(rows) if not args.no_id_join else None
+            with SweepGraphs(min(args.maker_th, *ths)) as memo:
+                maps = [cluster_makers(rows, th=t, block=not args.no_block, engine=args.engine,
+                                       id_join=not args.no_id_join, linked=linked) for t in ths]
+                maker_map = cluster_makers(rows, th=args.maker_th, block=not args.no_block,
+                                           engine=args.engine, id_join=not args.no_id_join, linked=linked)
+            sweep_report["maker"] = {"thresholds": sweep_summary(maps, ths), "scores": memo.counts()}
+            del maps
+        else:
+            maker_map = cluster_makers(rows, th=args.maker_th, block=not args.no_block,
+                                       engine=args.engine, id_join=not args.no_id_join)
+        if prof:
+            calls, passed = score_delta(before, args.maker_th)
+            st["scores"] = {"calls": calls, "passed": passed}
+            st["clusters"] = {"count": len(set(maker_map.values())),
+                              "size_hist": size_histogram(Counter(maker_map.values()).values())}
     if args.makers:
-        os.makedirs(os.path.dirname(args.makers), exist_ok=True)
-        with open(args.makers, "w", encoding="utf-8") as f:
-            json.dump(maker_map, f, ensure_ascii=False, indent=2)
+        write_maker_map(args.makers, maker_map)
 
     # メーカー代表名に置き換え
     for r in rows:
-        r["maker_rep"] = maker_map.get(r["maker_norm"], r["maker_norm"])
+        r.maker_rep = maker_map.get(r.maker_norm, r.maker_norm)
 
     # 2) メーカーごとに分桶
     buckets = defaultdict(list)
     for r in rows:
-        buckets[r["maker_rep"]].append(r)
-
-    # 3) モデルクラスタ→統合
-    unified = []
-    for maker_rep, items in buckets.items():
-        model_map = cluster_models(items, th=args.model_th)
-        # 代表モデルごとに束ねる
-        clusters = defaultdict(list)
-        for it in items:
-            rep = model_map.get(it["model_norm"], it["model_norm"])
-            clusters[rep].append(it)
-
-        for model_rep, group in clusters.items():
-            merged = merge_cluster(group)
-            merged["maker"] = {
-                "id": maker_rep,               # 名寄せ後の代表名（ID代わり）
-                "aliases": sorted({x["maker_norm"] for x in group}),
-                "display_candidates": sorted({x["maker_raw"] for x in group}),
-            }
-            merged["id"] = f"{maker_rep}|{model_rep}"
-            # 代表モデル名（ID向けに英名優先で付けとく）
-            merged["model"]["id_name"] = (merged["model"]["name_en"] or
-                                          merged["model"]["name_ja"] or
-                                          model_rep)
-            unified.append(merged)
+        buckets[r.maker_rep].append(r)
+
+    # 3) モデルクラスタ→統合（--state があれば中身の変わらないメーカーは前回結果を使う）
+    digests = {m: bucket_digest(items) for m, items in buckets.items()} if args.state else {}
+    prev = state["buckets"] if state else {}
+    todo = {m: items for m, items in buckets.items()
+            if m not in prev or prev[m]["digest"] != digests[m]}
+    bucket_stats = {} if prof else None
+    model_sweeps = {} if args.sweep_model_th else None
+    with stage("cluster_models") as st:
+        fresh = unify_buckets(todo, th=args.model_th, block=not args.no_block,
+                              engine=args.engine, jobs=args.jobs, stats=bucket_stats,
+                              split_years=args.split_years, id_join=not args.no_id_join,
+                              sweep=args.sweep_model_th, sweeps=model_sweeps)
+        if prof:
+            st.update(bucket_profile(bucket_stats))
+            st["buckets"] = len(todo)
+    if model_sweeps is not None:
+        sweep_report["model"] = merge_sweeps(model_sweeps[m] for m in todo)
+    per_maker = {m: fresh[m] if m in fresh else prev[m]["rows"] for m in buckets}
+    unified = [x for m in buckets for x in per_maker[m]]
+    if args.state and not (reuse_makers and not todo and set(prev) == set(buckets)):
+        save_state(args.state, {
+            "version": STATE_VERSION,
+            "params": params,
+            "makers": {"digest": mdigest, "map": maker_map},
+            "buckets": {m: {"digest": digests[m], "rows": per_maker[m]} for m in buckets},
+        })
+    if args.state:
+        print(f"state: reclustered {len(todo)}/{len(buckets)} makers -> {args.state}")
+
+    if sweep_report:
+        for key in ("maker", "model"):
+            if key in sweep_report:
+                print_sweep(key, sweep_report[key])
+        if args.sweep_report:
+            sweep_report.update({"version": SWEEP_VERSION, "engine": args.engine,
+                                 "maker_th": args.maker_th, "model_th": args.model_th})
+            os.makedirs(os.path.dirname(args.sweep_report) or ".", exist_ok=True)
+            _write_bytes(args.sweep_report,
+                         json.dumps(sweep_report, ensure_ascii=False, indent=2).encode("utf-8"))
+            print(f"wrote sweep report -> {args.sweep_report}")
 
     # 4) 出力
-    write_jsonl(args.out, unified)
-    print(f"wrote {len(unified)} rows -> {args.out}")
-    print("done.")
+    with stage("write"):
+        write_jsonl(args.out, unified)
+        print(f"wrote {len(unified)} rows -> {args.out}")
+        if args.shards:
+            man = write_shards(args.shards, per_maker)
+            print(f"wrote {len(man['shards'])} shards -> {args.shards}")
+        if args.search_index:
+            idx = write_search_index(args.search_index, unified)
+            print(f"wrote search index ({len(idx['terms'])} terms) -> {args.search_index}")
+        if args.snapshot:
+            info = write_snapshot(args.snapshot, unified)
+            print(f"wrote snapshot ({info['records']} records, {info['strings']} strings, "
+                  f"{info['bytes']} bytes) -> {args.snapshot}")
+        if args.sqlite:
+            info = write_sqlite(args.sqlite, unified)
+            if not info["fts5"]:
+                print("warning: this SQLite build has no FTS5; names_fts was not created", file=sys.stderr)
+            print(f"wrote sqlite ({info['models']} models, {info['makers']} makers) -> {args.sqlite}")
+    if prev_catalog is not None:
+        with stage("changefeed"):
+            emit_changefeed(args, prev_catalog)
+    finish(args, prof, rows=input_rows, distinct_rows=len(rows), unified_rows=len(unified))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,149 @@
+# catalog_changefeed.py
+# 前回の統合結果(JSONL)と今回の統合結果を id と行の内容ハッシュで突き合わせ、
+# 追加・変更・削除された行だけを JSONL で書く（carbike_infomation.py --prev / --changefeed から使う）。
+# Firestore 同期やフロントのキャッシュは差分だけ反映すればよい。
+#   {"op":"header", "version", "prev_rows", "rows", "counts"}
+#   {"op":"remap", "kind":"merge|split|rename|regroup", "from":[前回の id], "to":[今回の id]}
+#   {"op":"remove", "id", "prev_hash"}
+#   {"op":"add" | "change", "id", "hash", ("prev_hash",) "record"}
+# 内容ハッシュは読み直した行をキー順・区切りを揃えて書き直したものから取るので、
+# 書き出し側の形式（区切りの空白・キー順・JSON バックエンド）が変わっても同じ内容なら同じ値になる。
+# remap はクラスタがくっついた・分かれた・代表名が変わった行の対応で、
+# 削除・追加・変更された行どうしを (メーカー別名, モデル別名) の共有でつないで求める
+import hashlib
+import json
+import os
+import sys
+from collections import defaultdict
+
+from catalog_unionfind import DisjointSet
+
+CHANGEFEED_VERSION = 1
+BATCH = 4096  # 追加・変更行をこの件数ごとにまとめて書く
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _dump_lines(objs) -> bytes:
+    return b"".join(_dumps(o) + b"\n" for o in objs)
+
+
+def row_hash(row) -> str:
+    data = json.dumps(row, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def remap_keys(row) -> set:
+    return {(m, a) for m in row["maker"]["aliases"] for a in row["model"]["aliases"]}
+
+
+def load_prev_catalog(path) -> dict:
+    # 前回の出力の id → 内容ハッシュ と (メーカー別名, モデル別名) → id の索引。
+    # --out と同じパスでもよいよう、書き出す前に読んでおく。無ければ空（全行が追加になる）
+    prev = {"hashes": {}, "keys": defaultdict(list), "malformed": 0}
+    if not os.path.exists(path):
+        print(f"warning: {path}: previous catalog not found; every row is reported as added",
+              file=sys.stderr)
+        return prev
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.rstrip(b"\r\n")
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+                rid = row["id"]
+                keys = remap_keys(row)
+            except Exception:
+                prev["malformed"] += 1
+                continue
+            prev["hashes"][rid] = row_hash(row)
+            for k in keys:
+                prev["keys"][k].append(rid)
+    if prev["malformed"]:
+        print(f"warning: {path}: skipped {prev['malformed']} malformed lines", file=sys.stderr)
+    return prev
+
+
+def _iter_catalog(path):
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.rstrip(b"\r\n")
+            if line:
+                yield json.loads(line)
+
+
+def find_remaps(prev, old_ids, new_keys) -> list:
+    # old_ids: 前回側で動いた id（削除・変更）、new_keys: 今回側で動いた id（追加・変更）→ 別名キー。
+    # 共有キーでつないだ連結成分のうち、追加か削除を含むものが remap
+    sets = DisjointSet()
+    for rid, keys in new_keys.items():
+        for k in keys:
+            for oid in prev["keys"].get(k, ()):
+                if oid in old_ids:
+                    sets.union(("+", rid), ("-", oid))
+    hashes = prev["hashes"]
+    out = []
+    for comp in sets.groups():
+        old, new = [], []
+        for side, rid in comp:
+            (new if side == "+" else old).append(rid)
+        old, new = sorted(set(old)), sorted(set(new))
+        if old == new and all(rid in hashes for rid in new):
+            continue  # 変更された行がそのまま残っただけ
+        kind = ("rename" if len(old) == len(new) == 1 else "merge" if len(new) == 1 else
+                "split" if len(old) == 1 else "regroup")
+        out.append({"op": "remap", "kind": kind, "from": old, "to": new})
+    out.sort(key=lambda r: (r["to"], r["from"]))
+    return out
+
+
+def write_changefeed(path, prev, out_path) -> dict:
+    # prev: load_prev_catalog の結果。今回の出力は out_path から2回読む（1回目で差分の id を集め、
+    # 2回目で追加・変更行の中身を書く）ので、全行をメモリに持たない
+    hashes = prev["hashes"]
+    seen = set()
+    moved = {}  # 追加・変更された id → 今回の内容ハッシュ
+    new_keys = {}
+    rows = 0
+    for row in _iter_catalog(out_path):
+        rows += 1
+        rid = row["id"]
+        seen.add(rid)
+        h = row_hash(row)
+        if hashes.get(rid) != h:
+            moved[rid] = h
+            new_keys[rid] = remap_keys(row)
+    removed = sorted(rid for rid in hashes if rid not in seen)
+    changed = sum(1 for rid in moved if rid in hashes)
+    remaps = find_remaps(prev, set(removed) | (moved.keys() & hashes.keys()), new_keys)
+    del new_keys
+    counts = {"added": len(moved) - changed, "changed": changed, "removed": len(removed),
+              "unchanged": rows - len(moved), "remaps": len(remaps)}
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(_dumps({"op": "header", "version": CHANGEFEED_VERSION,
+                            "prev_rows": len(hashes), "rows": rows, "counts": counts}) + b"\n")
+        f.write(_dump_lines(remaps))
+        f.write(_dump_lines({"op": "remove", "id": rid, "prev_hash": hashes[rid]} for rid in removed))
+        batch = []
+        for row in _iter_catalog(out_path):
+            h = moved.get(row["id"])
+            if h is None:
+                continue
+            rec = {"op": "add", "id": row["id"], "hash": h}
+            if row["id"] in hashes:
+                rec["op"] = "change"
+                rec["prev_hash"] = hashes[row["id"]]
+            rec["record"] = row
+            batch.append(rec)
+            if len(batch) >= BATCH:
+                f.write(_dump_lines(batch))
+                batch = []
+        f.write(_dump_lines(batch))
+    os.replace(tmp, path)
+    return counts
@@ -0,0 +1,337 @@
+# catalog_resolver.py
+# 自由入力のメーカー名・モデル名を統合カタログの id（maker|model）に引く常駐リゾルバ。
+# カタログ（unified_models.jsonl か --snapshot のバイナリ）を起動時に1回だけ読み、
+# carbike_infomation.py と同じ正規化（norm_maker_name / norm_model_name）と
+# 類似度（rf_scores）・候補ブロッキング（BlockIndex）で上位 k 件をスコア付きで返す。
+#
+# - メーカー: 正規化名の完全一致（統合行の maker.aliases と --makers のマップ）→ 無ければ類似検索
+# - モデル: メーカーごとの候補索引（正規化名 → 行）を引く。メーカーが無い・引けなければ全体の索引
+# - 同じ問い合わせは LRU キャッシュから返す。処理時間は直近 LATENCY_WINDOW 件で集計
+#
+# 使い方:
+#   python catalog_resolver.py --catalog ./export/unified_models.jsonl \
+#     --makers ./export/makers_map.json --port 8765
+#   curl 'http://127.0.0.1:8765/resolve?maker=Toyota+Motor&model=corolla&k=3'
+#   curl -d '{"queries": [{"maker": "honda", "model": "civic type r"}]}' \
+#     http://127.0.0.1:8765/resolve/batch
+#   curl http://127.0.0.1:8765/stats
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import carbike_infomation as ci
+from catalog_snapshot import MAGIC, Snapshot
+
+DEFAULT_K = 5
+MAX_K = 50
+# 類似検索で残すスコアの下限（バッチの名寄せ閾値より緩め。候補を返して利用側で選ばせる）
+MAKER_MIN_SCORE = 85
+MODEL_MIN_SCORE = 70
+# 類似一致したメーカーのうちモデル検索に回す数
+MAX_MAKERS = 3
+CACHE_SIZE = 1 << 16
+LATENCY_WINDOW = 10000
+MAX_BATCH = 1000
+
+
+def load_catalog(path) -> list:
+    """統合行のリスト。先頭が スナップショットの magic ならバイナリとして読む"""
+    with open(path, "rb") as f:
+        head = f.read(len(MAGIC))
+    if head == MAGIC:
+        with Snapshot(path) as snap:
+            return list(snap)
+    return ci.load_jsonl(path)
+
+
+def model_key(name) -> str:
+    """モデル名の索引キー。自由入力は大文字小文字がばらつくので正規化後に casefold する"""
+    return ci.norm_model_name(name).casefold()
+
+
+def _is_int(v) -> bool:
+    return isinstance(v, int) and not isinstance(v, bool)
+
+
+def check_query(q):
+    """バッチの1件の型を確かめる（maker / model は文字列か null、k は整数）。不正なら ValueError"""
+    for key in ("maker", "model"):
+        if q.get(key) is not None and not isinstance(q[key], str):
+            raise ValueError(f"{key} must be a string")
+    if "k" in q and not _is_int(q["k"]):
+        raise ValueError("k must be an integer")
+
+
+class NameIndex:
+    """正規化名 → 値（行番号や代表メーカー名）の索引。名前が多ければ BlockIndex で比較相手を絞る"""
+
+    def __init__(self, th):
+        self.th = th
+        self.rows = defaultdict(list)
+        self.block = None
+
+    def add(self, name, v):
+        if name and v not in self.rows[name]:
+            self.rows[name].append(v)
+
+    def freeze(self):
+        names = sorted(self.rows)
+        self.names = names
+        if len(names) >= ci.BLOCK_MIN_NAMES:
+            # search は四捨五入して th 以上を残すので、索引も th - 0.5 以上を拾えるように作る
+            self.block = ci.BlockIndex(names, th=self.th - 0.5)
+
+    def search(self, name, min_score) -> list:
+        """[(スコア, 正規化名), ...]（スコア降順）。完全一致があればそれだけ返す"""
+        if name in self.rows:
+            return [(100, name)]
+        if self.block is not None:
+            cands = [self.names[j] for j in self.block.candidates(name)]
+        else:
+            cands = self.names
+        hits = []
+        for c, s in zip(cands, ci.rf_scores(name, cands, min_score - 0.5)):
+            s = round(s)
+            if s >= min_score:
+                hits.append((s, c))
+        hits.sort(key=lambda h: (-h[0], h[1]))
+        return hits
+
+
+class Resolver:
+    def __init__(self, rows, maker_map=None, maker_min=MAKER_MIN_SCORE, model_min=MODEL_MIN_SCORE,
+                 cache_size=CACHE_SIZE):
+        self.rows = rows
+        self.maker_min = maker_min
+        self.model_min = model_min
+        # 正規化メーカー名 → 代表名（統合行のメーカー別名と --makers のマップ）
+        self.maker_alias = dict(maker_map or {})
+        self.maker_index = NameIndex(maker_min)
+        self.models = {}                      # 代表メーカー名 → NameIndex
+        self.all_models = NameIndex(model_min)
+        for i, r in enumerate(rows):
+            rep = r["maker"]["id"]
+            self.maker_alias.setdefault(rep, rep)
+            for a in r["maker"].get("aliases") or ():
+                self.maker_alias.setdefault(a, rep)
+            idx = self.models.get(rep)
+            if idx is None:
+                idx = self.models[rep] = NameIndex(model_min)
+            m = r["model"]
+            for n in {m.get("name_en"), m.get("name_ja"), m.get("id_name"), *(m.get("aliases") or ())}:
+                if n:
+                    key = model_key(n)
+                    idx.add(key, i)
+                    self.all_models.add(key, i)
+        # --makers のマップにだけあって統合行の無い代表名は引けないので捨てる
+        self.maker_alias = {a: rep for a, rep in self.maker_alias.items() if rep in self.models}
+        for a, rep in self.maker_alias.items():
+            self.maker_index.add(a, rep)
+        self.maker_index.freeze()
+        self.all_models.freeze()
+        for idx in self.models.values():
+            idx.freeze()
+        self._cached = lru_cache(maxsize=cache_size)(self._resolve)
+        self.latency = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def match_makers(self, maker) -> list:
+        """[(スコア, 代表メーカー名), ...]。同じ代表名は最高スコアだけ残す"""
+        key = ci.norm_maker_name(maker)
+        if not key:
+            return []
+        best = {}
+        for s, a in self.maker_index.search(key, self.maker_min):
+            for rep in self.maker_index.rows[a]:
+                if s > best.get(rep, -1):
+                    best[rep] = s
+        out = sorted(((s, rep) for rep, s in best.items()), key=lambda h: (-h[0], h[1]))
+        return out[:MAX_MAKERS]
+
+    def _resolve(self, maker, model, k):
+        key = model_key(model)
+        if not key:
+            return ()
+        makers = self.match_makers(maker) if maker else []
+        # メーカーが引ければそのメーカー内だけ、指定なし・不明なら全体の索引から探す
+        scopes = [(s, self.models[rep]) for s, rep in makers] or [(None, self.all_models)]
+        best = {}
+        for maker_score, idx in scopes:
+            for model_score, name in idx.search(key, self.model_min):
+                # 総合スコアはメーカー・モデルの積（どちらも完全一致なら100）
+                score = model_score if maker_score is None else round(model_score * maker_score / 100)
+                for i in idx.rows[name]:
+                    if i not in best or score > best[i][0]:
+                        best[i] = (score, maker_score, model_score)
+        ranked = sorted(best.items(), key=lambda kv: (-kv[1][0], self.rows[kv[0]]["id"]))[:k]
+        out = []
+        for i, (score, maker_score, model_score) in ranked:
+            r = self.rows[i]
+            out.append({
+                "id": r["id"],
+                "score": score,
+                "maker_score": maker_score,
+                "model_score": model_score,
+                "maker_display": r.get("maker_display"),
+                "name": r["model"].get("id_name"),
+                "years": r.get("years"),
+            })
+        return tuple(out)
+
+    def resolve(self, maker=None, model=None, k=DEFAULT_K) -> list:
+        """上位 k 件の候補（dict のリスト、スコア降順）"""
+        t = time.perf_counter()
+        k = max(1, min(int(k), MAX_K))
+        # キャッシュ内の dict を呼び出し側が書き換えても影響しないよう浅いコピーを返す
+        out = [dict(x) for x in self._cached((maker or "").strip(), (model or "").strip(), k)]
+        dt = time.perf_counter() - t
+        with self._lock:
+            self.requests += 1
+            self.latency.append(dt)
+        return out
+
+    def resolve_batch(self, queries, k=DEFAULT_K) -> list:
+        return [self.resolve(q.get("maker"), q.get("model"), q.get("k", k)) for q in queries]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lat = sorted(self.latency)
+            requests = self.requests
+        info = self._cached.cache_info()
+
+        def pct(p):
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1e3, 4) if lat else None
+
+        return {
+            "rows": len(self.rows),
+            "makers": len(self.models),
+            "maker_aliases": len(self.maker_alias),
+            "model_names": len(self.all_models.names),
+            "requests": requests,
+            "cache": {"hits": info.hits, "misses": info.misses, "size": info.currsize,
+                      "max": info.maxsize},
+            # 直近 LATENCY_WINDOW 件（ミリ秒）
+            "latency_ms": {
+                "window": len(lat),
+                "mean": round(sum(lat) / len(lat) * 1e3, 4) if lat else None,
+                "p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99),
+                "max": round(lat[-1] * 1e3, 4) if lat else None,
+            },
+        }
+
+
+# ---------- HTTP ----------
+class ResolverHandler(BaseHTTPRequestHandler):
+    resolver = None
+    quiet = True
+
+    def _send(self, code, obj):
+        body = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, fn):
+        # 想定外の例外でも接続を切らずに 500 を JSON で返す
+        try:
+            fn()
+        except Exception as e:
+            print(f"error: {self.command} {self.path}: {e!r}", file=sys.stderr)
+            self._send(500, {"error": f"internal error: {type(e).__name__}"})
+
+    def do_GET(self):
+        self._handle(self._get)
+
+    def do_POST(self):
+        self._handle(self._post)
+
+    def _get(self):
+        u = urlsplit(self.path)
+        q = {key: v[-1] for key, v in parse_qs(u.query).items()}
+        if u.path == "/resolve":
+            if not q.get("model"):
+                return self._send(400, {"error": "model is required"})
+            try:
+                k = int(q.get("k", DEFAULT_K))
+            except ValueError:
+                return self._send(400, {"error": "k must be an integer"})
+            return self._send(200, {"results": self.resolver.resolve(q.get("maker"), q["model"], k)})
+        if u.path == "/stats":
+            return self._send(200, self.resolver.stats())
+        if u.path == "/healthz":
+            return self._send(200, {"ok": True})
+        self._send(404, {"error": "not found"})
+
+    def _post(self):
+        if urlsplit(self.path).path != "/resolve/batch":
+            return self._send(404, {"error": "not found"})
+        try:
+            n = int(self.headers.get("Content-Length") or 0)
+            req = json.loads(self.rfile.read(n) or b"{}")
+            queries = req["queries"] if isinstance(req, dict) else req
+            k = req.get("k", DEFAULT_K) if isinstance(req, dict) else DEFAULT_K
+            if not _is_int(k):
+                raise ValueError("k must be an integer")
+            if not isinstance(queries, list) or not all(isinstance(x, dict) for x in queries):
+                raise ValueError("queries must be a list of objects")
+            for q in queries:
+                check_query(q)
+        except (KeyError, TypeError, ValueError) as e:
+            return self._send(400, {"error": f"bad request: {e}"})
+        if len(queries) > MAX_BATCH:
+            return self._send(413, {"error": f"at most {MAX_BATCH} queries per batch"})
+        self._send(200, {"results": self.resolver.resolve_batch(queries, k)})
+
+    def log_message(self, fmt, *args):
+        if not self.quiet:
+            super().log_message(fmt, *args)
+
+
+def serve(resolver, host="127.0.0.1", port=8765, quiet=True):
+    handler = type("Handler", (ResolverHandler,), {"resolver": resolver, "quiet": quiet})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    print(f"listening on http://{host}:{httpd.server_address[1]}", file=sys.stderr)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+def main():
+    """統合カタログを読み込み、メーカー名・モデル名 → 統合 id の解決を HTTP で提供する"""
+    ap = argparse.ArgumentParser(description=main.__doc__)
+    ap.add_argument("--catalog", required=True, help="統合 JSONL（--out）またはスナップショット（--snapshot）")
+    ap.add_argument("--makers", default=None, help="メーカー名寄せマップ（carbike_infomation.py --makers の出力）")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--maker-min", type=int, default=MAKER_MIN_SCORE, help="メーカー類似一致のスコア下限")
+    ap.add_argument("--model-min", type=int, default=MODEL_MIN_SCORE, help="モデル類似一致のスコア下限")
+    ap.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="問い合わせ結果の LRU キャッシュ件数")
+    ap.add_argument("--verbose", action="store_true", help="リクエストごとのアクセスログを出す")
+    args = ap.parse_args()
+
+    t = time.perf_counter()
+    rows = load_catalog(args.catalog)
+    maker_map = None
+    if args.makers:
+        with open(args.makers, "r", encoding="utf-8") as f:
+            maker_map = json.load(f)
+    resolver = Resolver(rows, maker_map, args.maker_min, args.model_min, args.cache_size)
+    print(f"loaded {len(rows)} rows / {len(resolver.models)} makers in "
+          f"{time.perf_counter() - t:.2f}s", file=sys.stderr)
+    serve(resolver, args.host, args.port, quiet=not args.verbose)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+# catalog_snapshot.py
+# 統合カタログ（unified_models.jsonl と同じ行）の mmap 用バイナリスナップショット。
+# 書き出しは carbike_infomation.py --snapshot から、読み込みは利用側サービスから使う。
+# 開くときは mmap してヘッダを読むだけで、行は参照されたときに初めて dict にする。
+#
+# 形式（リトルエンディアン、各セクションは8バイト境界）:
+#   ヘッダ   magic "CBSNAP\0\0" / version / 行数・メーカー数・文字列数 / セクション表
+#   STRINGS  重複を除いた UTF-8 文字列を連結したもの
+#   STROFF   文字列 k のバイト範囲 = STRINGS[STROFF[k]:STROFF[k+1]]（uint32, 文字列数+1）
+#   RECORDS  1行 = int32 x 16（REC_* の並び。文字列は文字列番号、None は -1）
+#   MAKERS   1メーカー = int32 x 3（名前, 先頭行, 行数）。名前のバイト順
+#   LISTS    別名などの文字列番号の並び（uint32）。行からは (先頭, 個数) で参照
+#   IDINDEX  行番号を id のバイト順に並べたもの（uint32）
+#   SOURCES  出典名の文字列番号（uint32）。行の sources はこの並びのビットマスク
+#   KINDS    kinds_seen 用の同上
+# 行はメーカー名の順にまとめて並べるので、メーカー単位の走査は連続範囲を読むだけ。
+#
+# 使い方:
+#   with Snapshot("unified.snap") as snap:
+#       snap.get("toyota|Corolla")
+#       for row in snap.iter_maker("toyota"): ...
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+MAGIC = b"CBSNAP\0\0"
+VERSION = 1
+
+# ヘッダ: magic, version, セクション数, 行数, メーカー数, 文字列数, 予備
+HEADER = struct.Struct("<8sIIIIII")
+SECTION = struct.Struct("<QQ")
+SECTIONS = ("STRINGS", "STROFF", "RECORDS", "MAKERS", "LISTS", "IDINDEX", "SOURCES", "KINDS")
+
+# RECORDS の列
+REC_FIELDS = ("id", "maker", "maker_display", "name_en", "name_ja", "id_name",
+              "year_start", "year_end", "sources", "kinds",
+              "aliases_at", "aliases_n", "maker_aliases_at", "maker_aliases_n",
+              "display_at", "display_n")
+REC_WIDTH = len(REC_FIELDS)
+(REC_ID, REC_MAKER, REC_MAKER_DISPLAY, REC_NAME_EN, REC_NAME_JA, REC_ID_NAME,
+ REC_YEAR_START, REC_YEAR_END, REC_SOURCES, REC_KINDS,
+ REC_ALIASES_AT, REC_ALIASES_N, REC_MAKER_ALIASES_AT, REC_MAKER_ALIASES_N,
+ REC_DISPLAY_AT, REC_DISPLAY_N) = range(REC_WIDTH)
+MAKER_WIDTH = 3
+NONE = -1
+# int32 のビットマスクなので符号ビットを除いた数まで
+MAX_FLAGS = 31
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+# ---------- 書き出し ----------
+class _Strings:
+    def __init__(self):
+        self.ids = {}
+        self.blob = bytearray()
+        self.offsets = array("I", [0])
+
+    def add(self, s):
+        if s is None:
+            return NONE
+        i = self.ids.get(s)
+        if i is None:
+            i = self.ids[s] = len(self.offsets) - 1
+            self.blob += s.encode("utf-8")
+            self.offsets.append(len(self.blob))
+        return i
+
+
+def _flag_table(rows, key, what):
+    # 名前 → ビット位置。名前順に振るので、ビットの小さい順に戻せばソート済みの並びになる
+    names = sorted({n for r in rows for n in r[key]})
+    if len(names) > MAX_FLAGS:
+        raise SnapshotError(f"too many distinct {what} (max {MAX_FLAGS})")
+    return {n: b for b, n in enumerate(names)}
+
+
+def _mask(names, table):
+    m = 0
+    for n in names:
+        m |= 1 << table[n]
+    return m
+
+
+def _le(a):
+    # ファイル上は常にリトルエンディアン
+    if sys.byteorder != "little":
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+
+def build_snapshot(rows) -> bytes:
+    strings = _Strings()
+    sources = _flag_table(rows, "sources", "sources")
+    kinds = _flag_table(rows, "kinds_seen", "kinds")
+    lists = array("I")
+    # メーカー名（バイト順）でまとめる。メーカー内は元の順
+    order = sorted(range(len(rows)), key=lambda i: rows[i]["maker"]["id"].encode("utf-8"))
+    recs = array("i")
+    makers = array("i")
+
+    def add_list(items):
+        at = len(lists)
+        lists.extend(strings.add(s) for s in items)
+        return at, len(items)
+
+    for i in order:
+        r = rows[i]
+        model, mk, years = r["model"], r["maker"], r["years"]
+        maker_sid = strings.add(mk["id"])
+        n = len(recs) // REC_WIDTH
+        if not makers or makers[-MAKER_WIDTH] != maker_sid:
+            makers.extend((maker_sid, n, 0))
+        makers[-1] += 1
+        rec = [NONE] * REC_WIDTH
+        rec[REC_ID] = strings.add(r["id"])
+        rec[REC_MAKER] = maker_sid
+        rec[REC_MAKER_DISPLAY] = strings.add(r["maker_display"])
+        rec[REC_NAME_EN] = strings.add(model["name_en"])
+        rec[REC_NAME_JA] = strings.add(model["name_ja"])
+        rec[REC_ID_NAME] = strings.add(model["id_name"])
+        rec[REC_YEAR_START] = NONE if years["start"] is None else years["start"]
+        rec[REC_YEAR_END] = NONE if years["end"] is None else years["end"]
+        rec[REC_SOURCES] = _mask(r["sources"], sources)
+        rec[REC_KINDS] = _mask(r["kinds_seen"], kinds)
+        rec[REC_ALIASES_AT], rec[REC_ALIASES_N] = add_list(model["aliases"])
+        rec[REC_MAKER_ALIASES_AT], rec[REC_MAKER_ALIASES_N] = add_list(mk["aliases"])
+        rec[REC_DISPLAY_AT], rec[REC_DISPLAY_N] = add_list(mk["display_candidates"])
+        recs.extend(rec)
+
+    n_recs = len(recs) // REC_WIDTH
+    ids = recs[REC_ID::REC_WIDTH]
+    sid_bytes = lambda k: bytes(strings.blob[strings.offsets[k]:strings.offsets[k + 1]])
+    id_index = array("I", sorted(range(n_recs), key=lambda k: sid_bytes(ids[k])))
+    for a, b in zip(id_index, id_index[1:]):
+        if ids[a] == ids[b]:
+            raise SnapshotError(f"duplicate id: {sid_bytes(ids[a]).decode('utf-8')}")
+
+    # 出典・種別の名前も文字列表に入れてから STRINGS / STROFF を書く
+    source_names = array("I", (strings.add(n) for n in sources))
+    kind_names = array("I", (strings.add(n) for n in kinds))
+    bodies = [
+        bytes(strings.blob),
+        _le(strings.offsets),
+        _le(recs),
+        _le(makers),
+        _le(lists),
+        _le(id_index),
+        _le(source_names),
+        _le(kind_names),
+    ]
+
+    head_len = HEADER.size + SECTION.size * len(SECTIONS)
+    out = bytearray(head_len)
+    table = []
+    for body in bodies:
+        out += b"\0" * (-len(out) % 8)
+        table.append((len(out), len(body)))
+        out += body
+    HEADER.pack_into(out, 0, MAGIC, VERSION, len(SECTIONS), n_recs,
+                     len(makers) // MAKER_WIDTH, len(strings.offsets) - 1, 0)
+    for k, (off, size) in enumerate(table):
+        SECTION.pack_into(out, HEADER.size + SECTION.size * k, off, size)
+    return bytes(out)
+
+
+def write_snapshot(path, rows) -> dict:
+    # 一時ファイル→rename（読み手が mmap 中の古い版はそのまま読める）
+    data = build_snapshot(rows)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    _, _, _, n_recs, n_makers, n_strings, _ = HEADER.unpack_from(data, 0)
+    return {"records": n_recs, "makers": n_makers, "strings": n_strings, "bytes": len(data)}
+
+
+# ---------- 読み込み ----------
+class Snapshot:
+    def __init__(self, path):
+        self._f = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._f.close()
+            raise SnapshotError(f"empty snapshot: {path}")
+        if len(self._mm) < HEADER.size:
+            self.close()
+            raise SnapshotError(f"not a catalog snapshot: {path}")
+        magic, version, n_sections, n_recs, n_makers, n_strings, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or n_sections != len(SECTIONS):
+            self.close()
+            raise SnapshotError(f"not a catalog snapshot: {path}")
+        if version != VERSION:
+            self.close()
+            raise SnapshotError(f"unsupported snapshot version {version}: {path}")
+        self.n_records, self.n_makers, self.n_strings = n_recs, n_makers, n_strings
+        # close() で mmap を閉じられるよう、作った memoryview は全部覚えておく
+        self._views = [memoryview(self._mm)]
+        sec = {}
+        for k, name in enumerate(SECTIONS):
+            off, size = SECTION.unpack_from(self._mm, HEADER.size + SECTION.size * k)
+            sec[name] = self._views[0][off:off + size]
+            self._views.append(sec[name])
+        self._strings = sec["STRINGS"]
+        self._stroff = self._array(sec["STROFF"], "I")
+        self._recs = self._array(sec["RECORDS"], "i")
+        self._makers = self._array(sec["MAKERS"], "i")
+        self._lists = self._array(sec["LISTS"], "I")
+        self._id_index = self._array(sec["IDINDEX"], "I")
+        self._source_names = [self.string(k) for k in self._array(sec["SOURCES"], "I")]
+        self._kind_names = [self.string(k) for k in self._array(sec["KINDS"], "I")]
+
+    def _array(self, view, typecode):
+        # リトルエンディアンの環境ではコピーせずにそのまま数値配列として見る
+        if sys.byteorder == "little":
+            self._views.append(view.cast(typecode))
+            return self._views[-1]
+        a = array(typecode, view.tobytes())
+        a.byteswap()
+        return a
+
+    def close(self):
+        for v in reversed(getattr(self, "_views", ())):
+            v.release()
+        self._views = []
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.n_records
+
+    def string(self, k):
+        if k == NONE:
+            return None
+        return str(self._strings[self._stroff[k]:self._stroff[k + 1]], "utf-8")
+
+    def _string_bytes(self, k):
+        return self._strings[self._stroff[k]:self._stroff[k + 1]].tobytes()
+
+    def _list(self, at, n):
+        return [self.string(k) for k in self._lists[at:at + n]]
+
+    def record(self, i) -> dict:
+        # i 行目を unified_models.jsonl の1行と同じ形の dict にする
+        if not 0 <= i < self.n_records:
+            raise IndexError(i)
+        r = self._recs[i * REC_WIDTH:(i + 1) * REC_WIDTH]
+        s = self.string
+        return {
+            "maker_display": s(r[REC_MAKER_DISPLAY]),
+            "model": {
+                "name_en": s(r[REC_NAME_EN]),
+                "name_ja": s(r[REC_NAME_JA]),
+                "aliases": self._list(r[REC_ALIASES_AT], r[REC_ALIASES_N]),
+                "id_name": s(r[REC_ID_NAME]),
+            },
+            "years": {
+                "start": None if r[REC_YEAR_START] == NONE else r[REC_YEAR_START],
+                "end": None if r[REC_YEAR_END] == NONE else r[REC_YEAR_END],
+            },
+            "sources": [n for b, n in enumerate(self._source_names) if r[REC_SOURCES] >> b & 1],
+            "kinds_seen": [n for b, n in enumerate(self._kind_names) if r[REC_KINDS] >> b & 1],
+            "maker": {
+                "id": s(r[REC_MAKER]),
+                "aliases": self._list(r[REC_MAKER_ALIASES_AT], r[REC_MAKER_ALIASES_N]),
+                "display_candidates": self._list(r[REC_DISPLAY_AT], r[REC_DISPLAY_N]),
+            },
+            "id": s(r[REC_ID]),
+        }
+
+    def __iter__(self):
+        for i in range(self.n_records):
+            yield self.record(i)
+
+    def find(self, row_id) -> int:
+        # id → 行番号（無ければ -1）。IDINDEX を二分探索する
+        key = row_id.encode("utf-8")
+        idx, recs = self._id_index, self._recs
+        lo, hi = 0, len(idx)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._string_bytes(recs[idx[mid] * REC_WIDTH + REC_ID]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(idx):
+            i = idx[lo]
+            if self._string_bytes(recs[i * REC_WIDTH + REC_ID]) == key:
+                return i
+        return -1
+
+    def get(self, row_id):
+        i = self.find(row_id)
+        return None if i < 0 else self.record(i)
+
+    def makers(self) -> list:
+        # [(メーカー名, 行数), ...]（名前のバイト順）
+        m = self._makers
+        return [(self.string(m[k * MAKER_WIDTH]), m[k * MAKER_WIDTH + 2]) for k in range(self.n_makers)]
+
+    def maker_range(self, maker_id) -> range:
+        # メーカー名 → そのメーカーの行番号の範囲（無ければ空）
+        key = maker_id.encode("utf-8")
+        m = self._makers
+        k = bisect_left(range(self.n_makers), key,
+                        key=lambda j: self._string_bytes(m[j * MAKER_WIDTH]))
+        if k < self.n_makers and self._string_bytes(m[k * MAKER_WIDTH]) == key:
+            first, n = m[k * MAKER_WIDTH + 1], m[k * MAKER_WIDTH + 2]
+            return range(first, first + n)
+        return range(0)
+
+    def iter_maker(self, maker_id):
+        for i in self.maker_range(maker_id):
+            yield self.record(i)
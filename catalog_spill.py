@@ -0,0 +1,45 @@
+# catalog_spill.py
+# carbike_infomation.py --spill-dir の退避ファイル。行（任意の pickle できるタプル）を
+# SPILL_BATCH 件ずつ pickle して追記し、書いた順に読み戻す。振り分け先のパーティションは
+# プロセスによらず同じになるよう crc32 で決める
+import pickle
+import zlib
+
+SPILL_PARTITIONS = 64
+SPILL_BATCH = 512  # 1回の pickle にまとめる行数（パーティションごとのバッファもこの分だけ）
+
+
+class SpillWriter:
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, "wb")
+        self.buf = []
+
+    def add(self, rec):
+        self.buf.append(rec)
+        if len(self.buf) >= SPILL_BATCH:
+            self.flush()
+
+    def flush(self):
+        if self.buf:
+            pickle.dump(self.buf, self.f, protocol=pickle.HIGHEST_PROTOCOL)
+            self.buf = []
+
+    def close(self):
+        self.flush()
+        self.f.close()
+
+
+def iter_spill(path):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            yield from batch
+
+
+def spill_partition(maker_rep, parts=SPILL_PARTITIONS) -> int:
+    # hash() はプロセスごとに変わるので crc32 で振り分ける
+    return zlib.crc32(maker_rep.encode("utf-8")) % parts
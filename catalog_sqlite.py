@@ -0,0 +1,147 @@
+# catalog_sqlite.py
+# 統合カタログ（unified_models.jsonl と同じ行）を正規化したテーブルに入れた SQLite ファイル。
+# 書き出しは carbike_infomation.py --sqlite から使う。メーカー・年・出典での
+# 絞り込みはインデックスで、名前の検索（前方一致含む）は FTS5 で引ける。
+#   makers(id, name, display)                 name = 名寄せ後のメーカー代表名
+#   maker_aliases(maker_id, alias, kind)      kind = 'norm'（正規化名） / 'display'（元表記）
+#   models(id, uid, maker_id, name_en, name_ja, id_name, maker_display, year_start, year_end)
+#   model_aliases(model_id, alias)
+#   model_kinds(model_id, kind)
+#   sources(id, name) / model_sources(model_id, source_id)
+#   names_fts(label, names)                   rowid = models.id（FTS5 が使えるときだけ）
+# 例: SELECT m.* FROM names_fts JOIN models m ON m.id = names_fts.rowid
+#     WHERE names_fts MATCH 'coro*' ORDER BY rank
+import json
+import os
+import sqlite3
+
+SQLITE_SCHEMA_VERSION = 1
+SQLITE_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE makers (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, display TEXT);
+CREATE TABLE maker_aliases (maker_id INTEGER NOT NULL REFERENCES makers(id),
+                            alias TEXT NOT NULL, kind TEXT NOT NULL);
+CREATE TABLE models (id INTEGER PRIMARY KEY, uid TEXT NOT NULL UNIQUE,
+                     maker_id INTEGER NOT NULL REFERENCES makers(id),
+                     name_en TEXT, name_ja TEXT, id_name TEXT, maker_display TEXT,
+                     year_start INTEGER, year_end INTEGER);
+CREATE TABLE model_aliases (model_id INTEGER NOT NULL REFERENCES models(id), alias TEXT NOT NULL);
+CREATE TABLE model_kinds (model_id INTEGER NOT NULL REFERENCES models(id), kind TEXT NOT NULL);
+CREATE TABLE sources (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE model_sources (model_id INTEGER NOT NULL REFERENCES models(id),
+                            source_id INTEGER NOT NULL REFERENCES sources(id));
+"""
+# インデックスは一括投入の後に作る（投入中に更新するより速い）
+SQLITE_INDEXES = """
+CREATE INDEX models_maker ON models(maker_id);
+CREATE INDEX models_years ON models(year_start, year_end);
+CREATE INDEX maker_aliases_maker ON maker_aliases(maker_id);
+CREATE INDEX maker_aliases_alias ON maker_aliases(alias);
+CREATE INDEX model_aliases_model ON model_aliases(model_id);
+CREATE INDEX model_aliases_alias ON model_aliases(alias);
+CREATE INDEX model_kinds_kind ON model_kinds(kind, model_id);
+CREATE INDEX model_sources_source ON model_sources(source_id, model_id);
+CREATE INDEX model_sources_model ON model_sources(model_id);
+"""
+SQLITE_FTS = """
+CREATE VIRTUAL TABLE names_fts USING fts5(label, names, prefix='2 3',
+                                          tokenize='unicode61 remove_diacritics 2');
+"""
+
+
+def sqlite_has_fts5(con) -> bool:
+    try:
+        con.execute("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)")
+        con.execute("DROP TABLE temp._fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _shorter(a, b):
+    # 短い方（同じ長さなら辞書順で前）。None は無いものとして扱う
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a, b, key=lambda s: (len(s), s))
+
+
+
+def write_sqlite(path, rows) -> dict:
+    # 一時ファイルに1トランザクションで書いてから置き換える（途中で落ちても前の版が残る）
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    con = sqlite3.connect(tmp, isolation_level=None)
+    try:
+        # 一時ファイルなのでジャーナル・fsync は不要
+        con.execute("PRAGMA journal_mode = OFF")
+        con.execute("PRAGMA synchronous = OFF")
+        fts = sqlite_has_fts5(con)
+        con.execute("BEGIN")
+        for q in (SQLITE_SCHEMA + SQLITE_FTS if fts else SQLITE_SCHEMA).split(";"):
+            if q.strip():
+                con.execute(q)
+
+        makers, sources = {}, {}
+        maker_rows, maker_aliases, models = [], [], []
+        model_aliases, model_kinds, model_sources, fts_rows = [], [], [], []
+        for mid, r in enumerate(rows, 1):
+            mk = r["maker"]
+            maker_id = makers.get(mk["id"])
+            if maker_id is None:
+                maker_id = makers[mk["id"]] = len(makers) + 1
+                maker_rows.append([maker_id, mk["id"], None])
+                # 同じメーカーの別名は行ごとに違い得るので、ここでは集めるだけ
+                maker_aliases.append(set())
+            # メーカーの表示名は行ごとの表示名のうち最短のもの（merge_cluster と同じ選び方）
+            maker_rows[maker_id - 1][2] = _shorter(maker_rows[maker_id - 1][2], r["maker_display"])
+            ma = maker_aliases[maker_id - 1]
+            ma.update((a, "norm") for a in mk["aliases"])
+            ma.update((a, "display") for a in mk["display_candidates"])
+            model = r["model"]
+            years = r["years"]
+            models.append((mid, r["id"], maker_id, model["name_en"], model["name_ja"],
+                           model["id_name"], r["maker_display"], years["start"], years["end"]))
+            model_aliases.extend((mid, a) for a in model["aliases"])
+            model_kinds.extend((mid, k) for k in r["kinds_seen"])
+            for src in r["sources"]:
+                sid = sources.get(src)
+                if sid is None:
+                    sid = sources[src] = len(sources) + 1
+                model_sources.append((mid, sid))
+            if fts:
+                label = f"{r['maker_display']} {model['name_ja'] or model['name_en'] or model['id_name']}"
+                names = dict.fromkeys(n for n in (model["name_en"], model["name_ja"], model["id_name"],
+                                                  r["maker_display"], *model["aliases"],
+                                                  *mk["aliases"], *mk["display_candidates"]) if n)
+                fts_rows.append((mid, label, "\n".join(names)))
+
+        con.executemany("INSERT INTO makers VALUES (?, ?, ?)", maker_rows)
+        con.executemany("INSERT INTO maker_aliases VALUES (?, ?, ?)",
+                        ((i, a, k) for i, aliases in enumerate(maker_aliases, 1) for a, k in sorted(aliases)))
+        con.executemany("INSERT INTO models VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", models)
+        con.executemany("INSERT INTO model_aliases VALUES (?, ?)", model_aliases)
+        con.executemany("INSERT INTO model_kinds VALUES (?, ?)", model_kinds)
+        con.executemany("INSERT INTO sources VALUES (?, ?)", ((i, n) for n, i in sources.items()))
+        con.executemany("INSERT INTO model_sources VALUES (?, ?)", model_sources)
+        if fts:
+            con.executemany("INSERT INTO names_fts(rowid, label, names) VALUES (?, ?, ?)", fts_rows)
+            con.execute("INSERT INTO names_fts(names_fts) VALUES ('optimize')")
+        for q in SQLITE_INDEXES.split(";"):
+            if q.strip():
+                con.execute(q)
+        info = {"version": SQLITE_SCHEMA_VERSION, "models": len(models), "makers": len(makers),
+                "sources": len(sources), "fts5": fts}
+        con.executemany("INSERT INTO meta VALUES (?, ?)", ((k, json.dumps(v)) for k, v in info.items()))
+        con.execute("COMMIT")
+        con.execute("ANALYZE")
+    except BaseException:
+        con.close()
+        os.remove(tmp)
+        raise
+    con.close()
+    os.replace(tmp, path)
+    return info
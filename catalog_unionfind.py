@@ -0,0 +1,36 @@
+# catalog_unionfind.py
+# 名寄せ・changefeed で使う union-find。要素は比較できるハッシュ可能な値（添字・名前・タプル）で、
+# 成分の根は常に成分内の最小の要素にする（どの順で union しても同じ根になる）。
+# union していない要素は持たないので、疎な集合にもそのまま使える
+from collections import defaultdict
+
+
+class DisjointSet:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        parent = self.parent
+        root = x
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while x != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            if rb < ra:
+                ra, rb = rb, ra
+            self.parent[rb] = ra
+            self.parent.setdefault(ra, ra)
+        return ra
+
+    def groups(self, items=None) -> list:
+        # 成分ごとの要素のリスト。items を渡せばその要素だけをその順に、
+        # 渡さなければ union したことのある要素だけを返す（成分の並びは先頭の要素の順）
+        out = defaultdict(list)
+        for x in (list(self.parent) if items is None else items):
+            out[self.find(x)].append(x)
+        return list(out.values())
@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import carbike_infomation as ci  # noqa: E402
+
+
+def make_rows(n, seed=1):
+    """統合行と同じ形のダミーデータを作る"""
+    rnd = random.Random(seed)
+    makers = ["Toyota", "Honda", "Nissan", "Mazda", "Yamaha", "Kawasaki", "BMW", "Ducati"]
+    rows = []
+    for i in range(n):
+        maker = rnd.choice(makers)
+        name = f"Model {i % 997} {rnd.choice(['GT', 'RS', 'Sport', ''])}".strip()
+        rows.append({
+            "maker_display": maker,
+            "model": {
+                "name_en": name,
+                "name_ja": f"モデル{i % 997}" if rnd.random() < 0.5 else None,
+                "aliases": [name.lower(), f"{maker} {name}"],
+                "id_name": name,
+            },
+            "years": {"start": rnd.randint(1960, 2020), "end": None},
+            "sources": ["vpic", "wikidata"],
+            "kinds_seen": ["car"],
+            "maker": {"id": maker.lower(), "aliases": [maker.lower()], "display_candidates": [maker]},
+            "id": f"{maker.lower()}|{name}",
+        })
+    return rows
+
+
+def bench(backend, path, repeat):
+    """1バックエンド分の読み込み・書き出し時間（それぞれ最速値）"""
+    ci.set_json_backend(backend)
+    read_s, write_s = [], []
+    rows = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        rows = [r for r, _, _ in ci.iter_jsonl_refs(path)]
+        read_s.append(time.perf_counter() - t)
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "out.jsonl")
+        for _ in range(repeat):
+            t = time.perf_counter()
+            ci.write_jsonl(out, rows)
+            write_s.append(time.perf_counter() - t)
+    return {
+        "backend": backend,
+        "rows": len(rows),
+        "read_s": min(read_s),
+        "write_s": min(write_s),
+        "read_rows_per_s": len(rows) / min(read_s),
+        "write_rows_per_s": len(rows) / min(write_s),
+    }
+
+
+def main():
+    """load_jsonl / write_jsonl のバックエンド（orjson / 標準json）を比較する"""
+    ap = argparse.ArgumentParser(description=main.__doc__)
+    ap.add_argument("--input", default=None, help="計測に使う JSONL（省略時はダミーデータを生成）")
+    ap.add_argument("--rows", type=int, default=200000, help="ダミーデータの行数")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", default=None, help="結果(JSON)の保存先")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.input
+        if not path:
+            path = os.path.join(tmp, "bench.jsonl")
+            ci.set_json_backend("json")
+            ci.write_jsonl(path, make_rows(args.rows))
+        results = [bench(b, path, args.repeat) for b in ci.JSON_BACKENDS]
+
+    for r in results:
+        print(f"{r['backend']:>7}: read {r['read_s']:.3f}s ({r['read_rows_per_s']:,.0f} rows/s)  "
+              f"write {r['write_s']:.3f}s ({r['write_rows_per_s']:,.0f} rows/s)")
+    if len(ci.JSON_BACKENDS) == 1:
+        print("orjson が無いため標準 json のみ計測しました")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"input": args.input, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import carbike_infomation as ci  # noqa: E402
+from gen_synthetic_catalog import generate, parse_lang_mix  # noqa: E402
+
+RESULTS_VERSION = 1
+
+# 生成ファイル → ingest の引数（main() と同じ対応）
+SOURCES = [
+    ("vpic", None, "vpic"),
+    ("wiki_ja", "ja", "ja.wikipedia"),
+    ("wiki_en", "en", "en.wikipedia"),
+    ("wd_cars", None, "wikidata"),
+    ("wd_bikes", None, "wikidata"),
+]
+STAGES = ("ingest", "dedup", "cluster_makers", "cluster_models", "merge_cluster")
+
+
+def parse_scales(text):
+    """'50x10,200x20' → [(50, 10), (200, 20)]（メーカー数 x メーカーあたりモデル数）"""
+    scales = []
+    for part in text.split(","):
+        m, sep, n = part.strip().partition("x")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"MAKERSxMODELS の形式で指定してください: {part}")
+        scales.append((int(m), int(n)))
+    return scales
+
+
+def run_stages(paths, th, block, engine):
+    """パイプラインを段階ごとに実行し、(段階ごとの秒数, 件数) を返す"""
+    ci.norm_maker_name.cache_clear()
+    ci.norm_model_name.cache_clear()
+    secs = dict.fromkeys(STAGES, 0.0)
+
+    t = time.perf_counter()
+    rows = []
+    for src, lang, tag in SOURCES:
+        rows += ci.ingest([paths[src]], lang=lang, source_tag=tag)
+    secs["ingest"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    rows = ci.collapse_duplicates(rows)
+    secs["dedup"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    maker_map = ci.cluster_makers(rows, th=th, block=block, engine=engine)
+    secs["cluster_makers"] = time.perf_counter() - t
+
+    buckets = defaultdict(list)
+    for r in rows:
+        r.maker_rep = maker_map.get(r.maker_norm, r.maker_norm)
+        buckets[r.maker_rep].append(r)
+
+    out_rows = 0
+    for items in buckets.values():
+        t = time.perf_counter()
+        model_map = ci.cluster_models(items, th=th, block=block, engine=engine)
+        secs["cluster_models"] += time.perf_counter() - t
+        clusters = defaultdict(list)
+        for it in items:
+            clusters[model_map.get(it.model_norm, it.model_norm)].append(it)
+        t = time.perf_counter()
+        for group in clusters.values():
+            ci.merge_cluster(group)
+        secs["merge_cluster"] += time.perf_counter() - t
+        out_rows += len(clusters)
+
+    counts = {"rows": sum(r.count for r in rows), "distinct_rows": len(rows), "makers": len(maker_map),
+              "maker_clusters": len(buckets), "unified_rows": out_rows}
+    return secs, counts
+
+
+def stage_peaks(paths, th, block, engine):
+    """段階ごとのピークメモリ（tracemalloc, バイト）。計測が重いので時間計測とは別に回す"""
+    peaks = {}
+    ci.norm_maker_name.cache_clear()
+    ci.norm_model_name.cache_clear()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        rows = []
+        for src, lang, tag in SOURCES:
+            rows += ci.ingest([paths[src]], lang=lang, source_tag=tag)
+        peaks["ingest"] = tracemalloc.get_traced_memory()[1] - base
+
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        rows = ci.collapse_duplicates(rows)
+        peaks["dedup"] = tracemalloc.get_traced_memory()[1] - base
+
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        maker_map = ci.cluster_makers(rows, th=th, block=block, engine=engine)
+        peaks["cluster_makers"] = tracemalloc.get_traced_memory()[1] - base
+
+        buckets = defaultdict(list)
+        for r in rows:
+            r.maker_rep = maker_map.get(r.maker_norm, r.maker_norm)
+            buckets[r.maker_rep].append(r)
+        peaks["cluster_models"] = peaks["merge_cluster"] = 0
+        for items in buckets.values():
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            model_map = ci.cluster_models(items, th=th, block=block, engine=engine)
+            peaks["cluster_models"] = max(peaks["cluster_models"],
+                                          tracemalloc.get_traced_memory()[1] - base)
+            clusters = defaultdict(list)
+            for it in items:
+                clusters[model_map.get(it.model_norm, it.model_norm)].append(it)
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            merged = [ci.merge_cluster(g) for g in clusters.values()]
+            peaks["merge_cluster"] = max(peaks["merge_cluster"],
+                                         tracemalloc.get_traced_memory()[1] - base)
+            del merged
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def run_main(paths, out_dir, th, engine, jobs):
+    """main() を別プロセスで実行し、経過時間と最大RSS(KiB)を返す"""
+    cmd = [sys.executable, os.path.join(ROOT, "carbike_infomation.py"),
+           "--vpic", paths["vpic"],
+           "--wiki-ja", paths["wiki_ja"], "--wiki-en", paths["wiki_en"],
+           "--wd-cars", paths["wd_cars"], "--wd-bikes", paths["wd_bikes"],
+           "--out", os.path.join(out_dir, "unified.jsonl"),
+           "--maker-th", str(th), "--model-th", str(th),
+           "--engine", engine, "--jobs", str(jobs)]
+    t = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    # wait4 ならこの子プロセス単体の rusage が取れる（ワーカープロセスは含まない）
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - t
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise RuntimeError(f"main() が失敗しました (exit {proc.returncode}): {' '.join(cmd)}")
+    return {"wall_s": wall, "max_rss_kib": usage.ru_maxrss}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def find_regressions(results, baseline, tolerance):
+    """同じ規模の計測点どうしで、baseline より tolerance 倍以上遅い段階を列挙する"""
+    base = {(p["makers"], p["models_per_maker"]): p for p in baseline.get("results", [])}
+    found = []
+    for p in results:
+        b = base.get((p["makers"], p["models_per_maker"]))
+        if not b:
+            continue
+        pairs = [(s, p["stages"][s]["wall_s"], b["stages"].get(s, {}).get("wall_s")) for s in STAGES]
+        if "main" in p and "main" in b:
+            pairs.append(("main", p["main"]["wall_s"], b["main"]["wall_s"]))
+        for stage, now, before in pairs:
+            if before and now > before * tolerance:
+                found.append((p["makers"], p["models_per_maker"], stage, before, now))
+    return found
+
+
+def main():
+    """ダミー入力で名寄せパイプラインの段階別の時間・メモリを規模ごとに計測する"""
+    ap = argparse.ArgumentParser(description=main.__doc__)
+    ap.add_argument("--scales", type=parse_scales, default=parse_scales("50x10,200x20,800x20"),
+                    help="計測する規模（メーカー数xモデル数, カンマ区切り）")
+    ap.add_argument("--lang-mix", type=parse_lang_mix, default=None, help="例: ja=0.5,en=0.9")
+    ap.add_argument("--noise", type=float, default=0.1, help="表記ゆれを入れる確率")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--th", type=int, default=92, help="メーカー・モデル共通の閾値")
+    ap.add_argument("--engine", choices=sorted(ci.CLUSTER_ENGINES), default="greedy")
+    ap.add_argument("--no-block", action="store_true")
+    ap.add_argument("--jobs", type=int, default=1, help="main() 計測時の --jobs")
+    ap.add_argument("--repeat", type=int, default=1, help="段階別計測の繰り返し回数（最速値を採用）")
+    ap.add_argument("--no-memory", action="store_true", help="段階別のピークメモリ計測を省く")
+    ap.add_argument("--no-main", action="store_true", help="main() 全体の計測を省く")
+    ap.add_argument("--out", default=None, help="結果(JSON)の保存先")
+    ap.add_argument("--baseline", default=None, help="比較する過去の結果(JSON)")
+    ap.add_argument("--tolerance", type=float, default=1.25,
+                    help="baseline の何倍より遅ければ退行とみなすか")
+    args = ap.parse_args()
+    block = not args.no_block
+
+    results = []
+    for makers, per_maker in args.scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths, _ = generate(tmp, makers, per_maker, args.lang_mix, args.noise, seed=args.seed)
+            best, counts = None, None
+            for _ in range(args.repeat):
+                secs, counts = run_stages(paths, args.th, block, args.engine)
+                best = secs if best is None else {s: min(best[s], secs[s]) for s in STAGES}
+            peaks = {} if args.no_memory else stage_peaks(paths, args.th, block, args.engine)
+            point = {
+                "makers": makers,
+                "models_per_maker": per_maker,
+                "counts": counts,
+                "stages": {s: {"wall_s": best[s], "peak_bytes": peaks.get(s)} for s in STAGES},
+            }
+            if not args.no_main:
+                point["main"] = run_main(paths, tmp, args.th, args.engine, args.jobs)
+        results.append(point)
+        line = "  ".join(f"{s} {point['stages'][s]['wall_s']:.3f}s" for s in STAGES)
+        if "main" in point:
+            line += f"  main {point['main']['wall_s']:.3f}s / {point['main']['max_rss_kib'] // 1024}MiB"
+        print(f"{makers}x{per_maker} ({counts['rows']} rows): {line}")
+
+    report = {
+        "version": RESULTS_VERSION,
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "have_rapidfuzz": ci.HAVE_RF,
+        "json_backend": ci.JSON_BACKEND,
+        "params": {"th": args.th, "engine": args.engine, "block": block, "jobs": args.jobs,
+                   "noise": args.noise, "lang_mix": args.lang_mix, "seed": args.seed},
+        "results": results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for makers, per_maker, stage, before, now in regressions:
+            print(f"regression: {makers}x{per_maker} {stage}: {before:.3f}s -> {now:.3f}s")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
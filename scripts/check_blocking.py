@@ -0,0 +1,96 @@
+import argparse
+import os
+import sys
+import tempfile
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import carbike_infomation as ci  # noqa: E402
+from bench_unify import SOURCES  # noqa: E402
+from gen_synthetic_catalog import generate, parse_lang_mix  # noqa: E402
+
+# 候補ブロッキング（BlockIndex）が閾値以上のペアを取りこぼさないことを、ダミー入力の
+# メーカー名・メーカーごとのモデル名で閾値ごとに確かめる。
+#   - 閾値以上のペアが全部 candidates() に入っているか（全ペアのスコアと突き合わせ）
+#   - 各エンジンのクラスタが --no-block（block=False）と一致するか
+
+
+def parse_thresholds(text):
+    try:
+        return [float(x) for x in text.split(",") if x.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"閾値はカンマ区切りの数値で指定してください: {text}")
+
+
+def name_lists(paths):
+    """[メーカー名の一覧, メーカーごとのモデル名の一覧, ...]（どれもソート済み）"""
+    rows = []
+    for src, lang, tag in SOURCES:
+        rows += ci.ingest([paths[src]], lang=lang, source_tag=tag)
+    models = defaultdict(set)
+    for r in rows:
+        if r.model_norm:
+            models[r.maker_norm].add(r.model_norm)
+    makers = sorted({r.maker_norm for r in rows if r.maker_norm})
+    return [makers] + [sorted(v) for _, v in sorted(models.items()) if len(v) > 1]
+
+
+def missed_pairs(names, th):
+    """閾値以上なのに候補に入らなかったペア [(名前, 名前, スコア), ...]"""
+    index = ci.BlockIndex(names, th)
+    missed = []
+    for i, a in enumerate(names):
+        cands = set(index.candidates(a, index.keys[i]))
+        for j, sc in enumerate(ci.rf_scores(a, names, th)):
+            if j != i and sc >= th and j not in cands:
+                missed.append((a, names[j], sc))
+    return missed
+
+
+def main():
+    """候補ブロッキングの結果が全ペア比較と一致するかを閾値ごとに確かめる"""
+    ap = argparse.ArgumentParser(description=main.__doc__)
+    ap.add_argument("--thresholds", type=parse_thresholds, default=parse_thresholds("60,70,80,85,88,92,95"),
+                    help="確かめる閾値（カンマ区切り）")
+    ap.add_argument("--engines", default="greedy,uf", help="クラスタを比べるエンジン（カンマ区切り）")
+    ap.add_argument("--makers", type=int, default=200, help="メーカー数")
+    ap.add_argument("--models-per-maker", type=int, default=20, help="メーカーあたりのモデル数")
+    ap.add_argument("--lang-mix", type=parse_lang_mix, default=None, help="例: ja=0.5,en=0.9")
+    ap.add_argument("--noise", type=float, default=0.3, help="表記ゆれを入れる確率")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    engines = [e for e in args.engines.split(",") if e]
+    for e in engines:
+        if e not in ci.CLUSTER_ENGINES:
+            ap.error(f"unknown engine: {e}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths, _ = generate(tmp, args.makers, args.models_per_maker, args.lang_mix, args.noise,
+                            seed=args.seed)
+        lists = name_lists(paths)
+
+    bad = 0
+    for th in args.thresholds:
+        missed = [m for names in lists for m in missed_pairs(names, th)]
+        for a, b, sc in missed[:5]:
+            print(f"  th {th}: missed {a!r} / {b!r} ({sc:.1f})")
+        diffs = []
+        for e in engines:
+            # greedy は BLOCK_MIN_NAMES 未満だと索引を使わないので、比べるのはそれ以上の一覧だけ
+            for names in lists:
+                if e == "greedy" and len(names) < ci.BLOCK_MIN_NAMES:
+                    continue
+                if ci.CLUSTER_ENGINES[e](names, th, True) != ci.CLUSTER_ENGINES[e](names, th, False):
+                    diffs.append((e, len(names)))
+        for e, n in diffs[:5]:
+            print(f"  th {th}: {e} clusters differ from --no-block ({n} names)")
+        print(f"th {th}: {len(missed)} missed pairs, {len(diffs)} cluster mismatches")
+        bad += len(missed) + len(diffs)
+    if bad:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import carbike_infomation as ci  # noqa: E402
+from bench_unify import SOURCES  # noqa: E402
+from gen_synthetic_catalog import generate, parse_lang_mix  # noqa: E402
+
+# 完全一致キーの結合（id_join）でメーカー名寄せが膨らまないことを、ダミー入力で確かめる。
+# モデル名だけのタイトルのような多くのメーカーにまたがるキーで無関係なメーカーが
+# つながると、最大クラスタが --no-id-join の何倍にもなる。
+#   - 最大メーカークラスタの名前数が --no-id-join の --max-ratio 倍以内か
+#   - 最大メーカークラスタの行数の割合
+
+
+def cluster_sizes(rows, maker_map):
+    """(最大クラスタの代表名, 名前数, 行数)"""
+    names = Counter(maker_map.values())
+    rep, size = max(names.items(), key=lambda kv: (kv[1], kv[0]))
+    return rep, size, sum(r.count for r in rows if maker_map.get(r.maker_norm) == rep)
+
+
+def main():
+    """id_join あり・なしで最大メーカークラスタの大きさを比べる"""
+    ap = argparse.ArgumentParser(description=main.__doc__)
+    ap.add_argument("--makers", type=int, default=1500, help="メーカー数")
+    ap.add_argument("--models-per-maker", type=int, default=60, help="メーカーあたりのモデル数")
+    ap.add_argument("--lang-mix", type=parse_lang_mix, default=None, help="例: ja=0.5,en=0.9")
+    ap.add_argument("--noise", type=float, default=0.1, help="表記ゆれを入れる確率")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--th", type=int, default=92, help="メーカー名の閾値")
+    ap.add_argument("--max-ratio", type=float, default=2.0,
+                    help="最大クラスタの名前数が --no-id-join の何倍までなら良しとするか")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths, _ = generate(tmp, args.makers, args.models_per_maker, args.lang_mix, args.noise,
+                            seed=args.seed)
+        rows = []
+        for src, lang, tag in SOURCES:
+            rows += ci.ingest([paths[src]], lang=lang, source_tag=tag)
+    rows = ci.collapse_duplicates(rows)
+    total = sum(r.count for r in rows)
+
+    sizes = {}
+    for id_join in (False, True):
+        t = time.perf_counter()
+        maker_map = ci.cluster_makers(rows, th=args.th, id_join=id_join)
+        ms = (time.perf_counter() - t) * 1000
+        rep, size, n = sizes[id_join] = cluster_sizes(rows, maker_map)
+        label = "id_join" if id_join else "no_id_join"
+        print(f"{label}: {len(set(maker_map.values()))} makers, largest {rep!r} {size} names, "
+              f"{n}/{total} rows ({n / total:.1%}), {ms:.0f}ms")
+    if sizes[True][1] > args.max_ratio * sizes[False][1]:
+        print(f"largest maker cluster grew {sizes[True][1]} / {sizes[False][1]} names "
+              f"(> {args.max_ratio}x)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
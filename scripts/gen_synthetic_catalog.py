@@ -0,0 +1,214 @@
+import argparse
+import json
+import os
+import random
+
+# carbike_infomation.py の入力（vPIC / Wikipedia ja・en / Wikidata 車・バイク）と
+# 同じ形の JSONL をダミーで作る。メーカー数・メーカーあたりのモデル数・言語構成・
+# 表記ゆれの割合を変えて、名寄せのスケーリング計測に使う。
+# 同じ引数と seed なら同じファイルができる。
+
+SOURCE_FILES = {
+    "vpic": "vpic.jsonl",
+    "wiki_ja": "wiki_ja.jsonl",
+    "wiki_en": "wiki_en.jsonl",
+    "wd_cars": "wd_cars.jsonl",
+    "wd_bikes": "wd_bikes.jsonl",
+}
+
+# 音節（ローマ字, カタカナ）。日本語版の車種名の一部はカタカナ表記にする
+SYLLABLES = [
+    ("ka", "カ"), ("ki", "キ"), ("ko", "コ"), ("sa", "サ"), ("shi", "シ"), ("su", "ス"),
+    ("ta", "タ"), ("to", "ト"), ("na", "ナ"), ("ni", "ニ"), ("no", "ノ"), ("ha", "ハ"),
+    ("mi", "ミ"), ("mo", "モ"), ("ra", "ラ"), ("ri", "リ"), ("ro", "ロ"), ("ze", "ゼ"),
+    ("ve", "ヴェ"), ("la", "ラ"), ("ma", "マ"), ("da", "ダ"), ("be", "ベ"), ("go", "ゴ"),
+    ("pa", "パ"), ("ne", "ネ"), ("lu", "ル"), ("vi", "ヴィ"), ("te", "テ"), ("zo", "ゾ"),
+]
+KANA_RATIO = 0.5
+
+MAKER_FORMS = ["{}", "{} Motor", "{} Motors", "{} Motor Co., Ltd.", "{} Corporation", "{} Inc."]
+MODEL_SUFFIXES = ["", "", "", " GT", " Sport", " Type R", " 250", " 400", " 650", " Hybrid"]
+MODEL_ALIAS_FORMS = ["{} (car)", "{} Series", "{}-II", "{} MkII"]
+
+YEAR_MIN, YEAR_MAX = 1960, 2024
+
+
+def make_word(rnd, lo, hi):
+    """音節をつないだ名前（ローマ字, カタカナ）"""
+    syl = [rnd.choice(SYLLABLES) for _ in range(rnd.randint(lo, hi))]
+    return "".join(s for s, _ in syl).capitalize(), "".join(k for _, k in syl)
+
+
+def typo(rnd, s):
+    """1文字の脱字・重複・入れ替え"""
+    if len(s) < 3:
+        return s
+    i = rnd.randrange(1, len(s) - 1)
+    op = rnd.randrange(3)
+    if op == 0:
+        return s[:i] + s[i + 1:]
+    if op == 1:
+        return s[:i] + s[i] + s[i:]
+    return s[:i - 1] + s[i] + s[i - 1] + s[i + 1:]
+
+
+def noisy_maker(rnd, name, noise):
+    if rnd.random() >= noise:
+        return name
+    if rnd.random() < 0.5:
+        return rnd.choice(MAKER_FORMS).format(name)
+    return rnd.choice([typo(rnd, name), name.upper(), name.lower()])
+
+
+def noisy_model(rnd, name, noise):
+    if rnd.random() >= noise:
+        return name
+    op = rnd.randrange(4)
+    if op == 0:
+        return typo(rnd, name)
+    if op == 1:
+        return rnd.choice(MODEL_ALIAS_FORMS).format(name)
+    if op == 2:
+        return name.replace(" ", "-") if " " in name else name.upper()
+    return name.lower()
+
+
+def random_years(rnd):
+    r = rnd.random()
+    if r < 0.2:
+        return None
+    start = rnd.randint(YEAR_MIN, YEAR_MAX)
+    if r < 0.5:
+        return {"start": start, "end": None}
+    return {"start": start, "end": min(YEAR_MAX, start + rnd.randint(0, 20))}
+
+
+def make_catalog(rnd, makers, models_per_maker, bike_ratio):
+    """正解データ: [(メーカー名, カタカナ名, kind, [(モデル名, カタカナ名), ...]), ...]"""
+    catalog = []
+    seen_makers = set()
+    while len(catalog) < makers:
+        name, maker_kana = make_word(rnd, 2, 4)
+        if name.lower() in seen_makers:
+            continue
+        seen_makers.add(name.lower())
+        kind = "bike" if rnd.random() < bike_ratio else "car"
+        models, seen = [], set()
+        # 名前空間が足りないときに無限ループしないよう試行回数を制限する
+        for _ in range(models_per_maker * 20):
+            if len(models) >= models_per_maker:
+                break
+            base, kana = make_word(rnd, 1, 3)
+            suffix = rnd.choice(MODEL_SUFFIXES)
+            model = base + suffix
+            if model.lower() in seen:
+                continue
+            seen.add(model.lower())
+            models.append((model, kana + suffix))
+        catalog.append((name, maker_kana, kind, models))
+    return catalog
+
+
+def parse_lang_mix(text):
+    """'ja=0.5,en=0.9' → {'ja': 0.5, 'en': 0.9}（各言語版に記事がある確率）"""
+    mix = {}
+    for part in text.split(","):
+        lang, sep, p = part.partition("=")
+        lang = lang.strip()
+        if lang not in ("ja", "en") or not sep:
+            raise ValueError(f"lang-mix は ja=P,en=P の形式で指定してください: {text}")
+        mix[lang] = float(p)
+    return mix
+
+
+def generate(out_dir, makers=200, models_per_maker=20, lang_mix=None, noise=0.1,
+             coverage=0.8, bike_ratio=0.3, seed=1):
+    """ダミー入力を out_dir に書き、{ソース名: パス} と件数を返す
+
+    各モデルは vPIC と Wikidata に coverage の確率で、Wikipedia は lang_mix の
+    言語ごとの確率で1行ずつ現れる。日本語版の一部はメーカー名・車種名ともカタカナで、
+    Wikidata の行には記事がある言語の sitelinks が付く。noise は行ごとにメーカー名・
+    モデル名へ表記ゆれ（typo・社名の語尾・別名）を入れる確率。
+    """
+    rnd = random.Random(seed)
+    lang_mix = {"ja": 0.5, "en": 0.9} if lang_mix is None else lang_mix
+    catalog = make_catalog(rnd, makers, models_per_maker, bike_ratio)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {src: os.path.join(out_dir, name) for src, name in SOURCE_FILES.items()}
+    files = {src: open(p, "w", encoding="utf-8") for src, p in paths.items()}
+    counts = dict.fromkeys(files, 0)
+    pageid = 0
+    qid = 0
+    try:
+        for maker, maker_kana, kind, models in catalog:
+            for model, kana in models:
+                titles = {}
+                if rnd.random() < coverage:
+                    rec = {"maker_name": noisy_maker(rnd, maker, noise),
+                           "model_name": noisy_model(rnd, model, noise),
+                           "kind": kind}
+                    years = random_years(rnd)
+                    if years:
+                        rec["years"] = years
+                    files["vpic"].write(json.dumps(rec, ensure_ascii=False) + "\n")
+                    counts["vpic"] += 1
+                for lang in ("ja", "en"):
+                    if rnd.random() >= lang_mix.get(lang, 0.0):
+                        continue
+                    pageid += 1
+                    title = model
+                    maker_name = maker
+                    if lang == "ja" and rnd.random() < KANA_RATIO:
+                        title, maker_name = kana, maker_kana
+                    title = noisy_model(rnd, title, noise)
+                    titles[f"{lang}wiki"] = title
+                    rec = {"maker": {"name": noisy_maker(rnd, maker_name, noise)},
+                           "model": title, "kind": kind,
+                           "pageid": pageid, "fulltitle": title}
+                    years = random_years(rnd)
+                    if years:
+                        rec["years"] = years
+                    src = f"wiki_{lang}"
+                    files[src].write(json.dumps(rec, ensure_ascii=False) + "\n")
+                    counts[src] += 1
+                if rnd.random() < coverage:
+                    qid += 1
+                    rec = {"item": f"http://www.wikidata.org/entity/Q{qid}",
+                           "itemLabel": noisy_model(rnd, model, noise),
+                           "maker_name": noisy_maker(rnd, maker, noise),
+                           "years": random_years(rnd)}
+                    if titles:
+                        # 言語間リンク（Wikipedia 記事があるモデルだけ）
+                        rec["sitelinks"] = titles
+                    src = "wd_bikes" if kind == "bike" else "wd_cars"
+                    files[src].write(json.dumps(rec, ensure_ascii=False) + "\n")
+                    counts[src] += 1
+    finally:
+        for f in files.values():
+            f.close()
+    return paths, counts
+
+
+def main():
+    """carbike_infomation.py 用のダミー入力 JSONL を生成する"""
+    ap = argparse.ArgumentParser(description=main.__doc__)
+    ap.add_argument("--out-dir", required=True, help="出力先ディレクトリ")
+    ap.add_argument("--makers", type=int, default=200, help="メーカー数")
+    ap.add_argument("--models-per-maker", type=int, default=20, help="メーカーあたりのモデル数")
+    ap.add_argument("--lang-mix", type=parse_lang_mix, default=None,
+                    help="Wikipedia 各言語版に記事がある確率（例: ja=0.5,en=0.9）")
+    ap.add_argument("--noise", type=float, default=0.1, help="表記ゆれを入れる確率")
+    ap.add_argument("--coverage", type=float, default=0.8,
+                    help="各モデルが vPIC / Wikidata に載っている確率")
+    ap.add_argument("--bike-ratio", type=float, default=0.3, help="バイクメーカーの割合")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    paths, counts = generate(args.out_dir, args.makers, args.models_per_maker, args.lang_mix,
+                             args.noise, args.coverage, args.bike_ratio, args.seed)
+    for src, p in paths.items():
+        print(f"  {p}: {counts[src]}件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# 対象外のファイル（既定）
+EXCLUDE_FILES = ["wd_bikes.jsonl", "wd_cars.jsonl"]
+
+# 配列形式を読むときの読み込み単位と、1レコードとして許容する最大サイズ
+CHUNK_CHARS = 1 << 20
+MAX_RECORD_CHARS = 64 << 20
+
+# 書き込みはこの件数ずつまとめて行う
+WRITE_BATCH = 1000
+
+
+def detect_array(f):
+    """先頭の空白以外の文字が '[' なら配列形式（読み位置は先頭に戻す）"""
+    while True:
+        ch = f.read(1)
+        if not ch:
+            f.seek(0)
+            return False
+        if not ch.isspace() and ch != "\ufeff":
+            f.seek(0)
+            return ch == "["
+
+
+def iter_array_records(f):
+    """配列形式 [ {...}, {...} ] を先頭から1件ずつ読む（全体をメモリに載せない）
+
+    「1行1オブジェクト＋末尾カンマ」のような手で崩れた配列（旧 nissan.jsonl）もそのまま読める。
+    """
+    dec = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    while True:
+        # 区切り（空白・カンマ・配列の括弧）を飛ばす
+        while pos < len(buf) and (buf[pos] in ",[]\ufeff" or buf[pos].isspace()):
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                return
+            chunk = f.read(CHUNK_CHARS)
+            eof = not chunk
+            buf, pos = chunk, 0
+            continue
+        try:
+            obj, end = dec.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            # 途中で切れているだけなら次のチャンクを足して読み直す
+            if eof or len(buf) - pos > MAX_RECORD_CHARS:
+                raise
+            chunk = f.read(CHUNK_CHARS)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        yield obj
+        pos = end
+
+
+def iter_jsonl_records(f):
+    """JSON Lines形式を1行ずつ読む"""
+    for lineno, line in enumerate(f, 1):
+        line = line.strip().lstrip("\ufeff")
+        if not line:
+            continue
+        # 配列から手で切り出した行に残りがちな末尾カンマは許容する
+        if line.endswith(","):
+            line = line[:-1]
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{lineno}行目: {e}") from None
+
+
+def rewrite_file(file_path, defaults):
+    """1ファイルを読みながら変換し、一時ファイルに書いてから置き換える
+
+    途中で失敗した場合は一時ファイルを消すだけで、元のファイルには触らない。
+    """
+    dirname = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".rewrite-", suffix=".jsonl", dir=dirname)
+    count = 0
+    try:
+        with open(file_path, "r", encoding="utf-8") as src, \
+                os.fdopen(fd, "w", encoding="utf-8") as dst:
+            records = iter_array_records(src) if detect_array(src) else iter_jsonl_records(src)
+            batch = []
+            for model in records:
+                for key, value in defaults.items():
+                    if key not in model:
+                        model[key] = value
+                batch.append(json.dumps(model, ensure_ascii=False) + "\n")
+                count += 1
+                if len(batch) >= WRITE_BATCH:
+                    dst.writelines(batch)
+                    batch = []
+            dst.writelines(batch)
+            dst.flush()
+            os.fsync(dst.fileno())
+        shutil.copymode(file_path, tmp_path)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return count
+
+
+def _rewrite_one(args):
+    file_path, defaults = args
+    try:
+        return file_path, rewrite_file(file_path, defaults), None
+    except Exception as e:
+        return file_path, 0, str(e)
+
+
+def parse_default(text):
+    """KEY=JSON 形式の既定値指定を (KEY, 値) にする"""
+    key, sep, value = text.partition("=")
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"KEY=JSON の形式で指定してください: {text}")
+    try:
+        return key, json.loads(value)
+    except json.JSONDecodeError:
+        raise argparse.ArgumentTypeError(f"既定値が JSON として読めません: {text}")
+
+
+def main():
+    """exportディレクトリ内のJSONLファイルを1行1オブジェクトの形式に揃え、既定フィールドを補う
+
+    配列形式・JSON Lines形式のどちらも逐次読み込みで処理し、
+    結果は一時ファイル→rename で原子的に置き換える。
+    """
+    ap = argparse.ArgumentParser(description=main.__doc__.splitlines()[0])
+    ap.add_argument("files", nargs="*", help="対象ファイル（省略時は export/*.jsonl）")
+    ap.add_argument("--exclude", nargs="*", default=EXCLUDE_FILES,
+                    help="対象外のファイル名")
+    ap.add_argument("--default", dest="defaults", action="append", type=parse_default,
+                    metavar="KEY=JSON", help='欠けていれば追加するフィールド（既定: codes=[]）')
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                    help="並列に処理するファイル数")
+    args = ap.parse_args()
+
+    defaults = dict(args.defaults) if args.defaults else {"codes": []}
+    files = args.files or sorted(glob.glob("export/*.jsonl"))
+
+    targets = []
+    for file_path in files:
+        filename = os.path.basename(file_path)
+        if filename in args.exclude:
+            print(f"スキップ: {filename}")
+            continue
+        targets.append(file_path)
+
+    failed = 0
+    work = [(p, defaults) for p in targets]
+    if args.jobs > 1 and len(work) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as ex:
+            results = list(ex.map(_rewrite_one, work))
+    else:
+        results = [_rewrite_one(w) for w in work]
+
+    for file_path, count, err in results:
+        filename = os.path.basename(file_path)
+        if err:
+            failed += 1
+            print(f"  エラー: {filename} - {err}")
+        else:
+            print(f"  完了: {filename} ({count}件)")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()